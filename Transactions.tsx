@@ -73,6 +73,8 @@ const transactionFormSchema = z.object({
 
 type TransactionFormValues = z.infer<typeof transactionFormSchema>;
 
+const PAGE_SIZE = 50;
+
 const Transactions = () => {
   const [transactions, setTransactions] = useState([]);
   const [search, setSearch] = useState("");
@@ -80,21 +82,41 @@ const Transactions = () => {
   const [categoryFilter, setCategoryFilter] = useState("all");
   const [isAddDialogOpen, setIsAddDialogOpen] = useState(false);
   const [loading, setLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
 
+  // Filters and search run on the server; refetch (after a pause in typing)
+  // whenever they change
   useEffect(() => {
-    fetchTransactions();
-  }, []);
+    const timer = setTimeout(() => fetchTransactions(), search ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [search, typeFilter, categoryFilter]);
+
+  const transactionsUrl = () => {
+    const params = new URLSearchParams();
+    if (typeFilter !== "all") params.set("type", typeFilter);
+    if (categoryFilter !== "all") params.set("category", categoryFilter);
+    if (search.trim()) {
+      params.set("q", search.trim());
+      return `http://localhost:8000/api/transactions/search/?${params}`;
+    }
+    params.set("page_size", String(PAGE_SIZE));
+    return `http://localhost:8000/api/transactions/?${params}`;
+  };
 
-  const fetchTransactions = async () => {
+  // Loads the first page, or with `url` (a response's `next`) appends the
+  // following one. The list is cursor-paginated: { next, results }; search
+  // returns its best matches as { results }.
+  const fetchTransactions = async (url?: string) => {
     try {
-      const response = await fetch('http://localhost:8000/api/transactions/', {
+      const response = await fetch(url || transactionsUrl(), {
         headers: {
           'Authorization': `Bearer ${localStorage.getItem('token')}`
         }
       });
       if (!response.ok) throw new Error('Failed to fetch transactions');
       const data = await response.json();
-      setTransactions(data);
+      setTransactions(url ? (current) => [...current, ...data.results] : data.results);
+      setNextPage(data.next || null);
     } catch (error) {
       console.error('Error fetching transactions:', error);
     } finally {
@@ -119,26 +141,6 @@ const Transactions = () => {
     });
   };
 
-  const filteredTransactions = transactions.filter((transaction) => {
-    if (
-      search &&
-      !transaction.description.toLowerCase().includes(search.toLowerCase()) &&
-      !transaction.category.toLowerCase().includes(search.toLowerCase())
-    ) {
-      return false;
-    }
-
-    if (typeFilter !== "all" && transaction.type !== typeFilter) {
-      return false;
-    }
-
-    if (categoryFilter !== "all" && transaction.category !== categoryFilter) {
-      return false;
-    }
-
-    return true;
-  });
-
   const form = useForm<TransactionFormValues>({
     resolver: zodResolver(transactionFormSchema),
     defaultValues: {
@@ -435,12 +437,12 @@ const Transactions = () => {
         </CardHeader>
         <CardContent>
           <div className="space-y-4">
-            {filteredTransactions.length === 0 ? (
+            {transactions.length === 0 ? (
               <div className="text-center py-6 text-muted-foreground">
                 No transactions found.
               </div>
             ) : (
-              filteredTransactions.map((transaction) => (
+              transactions.map((transaction) => (
                 <div
                   key={transaction.id}
                   className="flex items-center justify-between border-b py-4 last:border-0"
@@ -484,6 +486,13 @@ const Transactions = () => {
                 </div>
               ))
             )}
+            {nextPage && (
+              <div className="flex justify-center pt-2">
+                <Button variant="outline" onClick={() => fetchTransactions(nextPage)}>
+                  Load more
+                </Button>
+              </div>
+            )}
           </div>
         </CardContent>
       </Card>
@@ -64,11 +64,19 @@ export const authApi = {
 
 // Transactions API calls
 export const transactionsApi = {
+  // One page of the list: response.data is { next, results }. Filters
+  // (type, category, start_date, end_date, min_amount, max_amount,
+  // ordering, page_size) are applied on the server; pass `next` to getPage
+  // for the following page.
   getAll: (params?: any) => api.get("/transactions/", { params }),
-  getById: (id: string) => api.get(`/transactions/${id}/`),
+  getPage: (next: string) => api.get(next),
+  search: (q: string, params?: any) => api.get("/transactions/search/", { params: { q, ...params } }),
+  // Pass the row's current date when known: the server then only searches that month's partition
+  getById: (id: string, date?: string) => api.get(`/transactions/${id}/`, { params: { date } }),
   create: (transaction: any) => api.post("/transactions/", transaction),
-  update: (id: string, transaction: any) => api.put(`/transactions/${id}/`, transaction),
-  delete: (id: string) => api.delete(`/transactions/${id}/`),
+  update: (id: string, transaction: any, date?: string) =>
+    api.put(`/transactions/${id}/`, transaction, { params: { date } }),
+  delete: (id: string, date?: string) => api.delete(`/transactions/${id}/`, { params: { date } }),
 };
 
 // Budget API calls
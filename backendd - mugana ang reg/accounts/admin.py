@@ -1,5 +1,9 @@
 from django.contrib import admin
+from django.db import transaction
 from .models import CustomUser
+from api.cache import bump_version_on_commit
+from api import budgets, search
+from api.ledger import record_changes, snapshot
 from api.models import Transaction, Budget
 
 class CustomUserAdmin(admin.ModelAdmin):
@@ -9,13 +13,56 @@ class CustomUserAdmin(admin.ModelAdmin):
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ['user', 'amount', 'type', 'category', 'date']
     list_filter = ['type', 'category', 'date']
-    search_fields = ['description', 'user__email']
+    # Descriptions are searched through the full-text index, see get_search_results
+    search_fields = ['user__email']
+
+    # Admin edits go through the same ledger hook as the API so rollups and
+    # cached reports stay in step
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            previous = [snapshot(Transaction.objects.get(pk=obj.pk))] if change else []
+            super().save_model(request, obj, form, change)
+            record_changes(added=[obj], removed=previous)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            record_changes(removed=[obj])
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            removed = list(queryset)
+            super().delete_queryset(request, queryset)
+            record_changes(removed=removed)
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search.terms(search_term):
+            results |= queryset.filter(pk__in=search.matching(queryset, search_term).values('pk'))
+        return results, may_have_duplicates
 
 class BudgetAdmin(admin.ModelAdmin):
-    list_display = ['user', 'category', 'amount', 'period', 'start_date', 'end_date']
+    list_display = ['user', 'category', 'amount', 'spent', 'period', 'start_date', 'end_date']
     list_filter = ['category', 'period']
     search_fields = ['user__email']
 
+    readonly_fields = ['spent']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        budgets.recompute(obj)
+        bump_version_on_commit([obj.user_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_version_on_commit([obj.user_id])
+
+    def delete_queryset(self, request, queryset):
+        user_ids = list(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        bump_version_on_commit(user_ids)
+
 admin.site.register(Transaction, TransactionAdmin)
 admin.site.register(Budget, BudgetAdmin)
 admin.site.register(CustomUser, CustomUserAdmin)
@@ -0,0 +1,39 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .user_cache import cache_user, get_cache, user_key
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves request.user from a short-TTL cache
+    instead of selecting the user row on every request.
+
+    Entries are keyed by user id and a per-user version that CustomUser.save()
+    and delete() move on, so profile, preference and password changes and
+    deactivation take effect on the next request.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        # The version is read before the row, so a save committed while the
+        # row loads leaves it cached under the old, already dead version
+        key = user_key(user_id)
+        user = get_cache().get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache_user(user, key)
+            return user
+
+        # Same per-token checks as the parent, against the cached row
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
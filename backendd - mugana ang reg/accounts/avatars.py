@@ -0,0 +1,150 @@
+import hashlib
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+SIZES = (256, 128, 64)
+FORMATS = {
+    # name: (Pillow format, extension, content type, save options)
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', 'image/webp', {'quality': 80, 'method': 4}),
+}
+ACCEPTED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+DIRECTORY = 'avatars'
+NAME_RE = re.compile(r'^[0-9a-f]{20}-\d+\.(jpg|webp)$')
+CONTENT_TYPES = {extension: content_type for _, extension, content_type, _ in FORMATS.values()}
+
+
+class AvatarError(ValueError):
+    pass
+
+
+def load(upload):
+    if upload.size > settings.AVATAR_MAX_UPLOAD_SIZE:
+        raise AvatarError(f"Avatar must be smaller than {settings.AVATAR_MAX_UPLOAD_SIZE // (1024 * 1024)} MB")
+    try:
+        image = Image.open(upload)
+        if image.format not in ACCEPTED_FORMATS:
+            raise AvatarError("Avatar must be a JPEG, PNG, WebP or GIF image")
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise AvatarError("Avatar is not a readable image")
+
+    # Apply the EXIF orientation before the metadata is dropped
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        # Flatten transparency onto white; JPEG has no alpha
+        background = Image.new('RGB', image.size, 'white')
+        image = image.convert('RGBA')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    return image.convert('RGB')
+
+
+def encode(image, format):
+    pil_format, _, _, options = FORMATS[format]
+    buffer = BytesIO()
+    # Saving a fresh image without exif=/icc_profile= writes no metadata
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def process(upload):
+    """
+    Decode an uploaded avatar, square-crop it and write every size in every
+    format under a name derived from its bytes. Returns
+    {size: {format: storage name}}; nothing of the original is kept.
+    """
+    source = load(upload)
+    variants = {}
+    for size in SIZES:
+        image = ImageOps.fit(source, (size, size), Image.Resampling.LANCZOS)
+        variants[str(size)] = {}
+        for format, (_, extension, _, _) in FORMATS.items():
+            data = encode(image, format)
+            name = f'{DIRECTORY}/{hashlib.sha256(data).hexdigest()[:20]}-{size}.{extension}'
+            # Same bytes, same name: an existing file is already correct
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(data))
+            variants[str(size)][format] = name
+    return variants
+
+
+def variant_names(variants):
+    return {name for formats in variants.values() for name in formats.values()}
+
+
+def discard(user, variants):
+    """Delete a user's previous variants unless they or another user still use the same image."""
+    from .models import CustomUser
+
+    for name in variant_names(variants) - variant_names(user.avatar_variants or {}):
+        if not CustomUser.objects.filter(avatar_variants__icontains=name).exclude(pk=user.pk).exists():
+            default_storage.delete(name)
+
+
+def discard_on_commit(user, variants):
+    # Only once the user row pointing elsewhere is saved; a failed save keeps them
+    transaction.on_commit(lambda: discard(user, variants))
+
+
+def set_avatar(user, upload):
+    """
+    Process `upload` and point the user at it. The caller saves the user,
+    in the same transaction: the old files are deleted when it commits.
+    """
+    previous = user.avatar_variants
+    user.avatar_variants = process(upload)
+    # The plain avatar field (used by older clients) is the largest JPEG
+    user.avatar = user.avatar_variants[str(SIZES[0])]['jpeg']
+    if previous:
+        discard_on_commit(user, previous)
+
+
+def clear_avatar(user):
+    """Remove the user's avatar; like set_avatar, call it and save the user in one transaction."""
+    if user.avatar_variants:
+        discard_on_commit(user, user.avatar_variants)
+    user.avatar = None
+    user.avatar_variants = {}
+
+
+def avatar_urls(user):
+    return {
+        size: {format: default_storage.url(name) for format, name in formats.items()}
+        for size, formats in (user.avatar_variants or {}).items()
+    }
+
+
+def serve(request, name):
+    """
+    Serve a processed avatar. Names are content hashes, so responses never
+    change and can be cached forever. With AVATAR_SENDFILE the front-end
+    server streams the file and the worker only sends headers.
+    """
+    match = NAME_RE.match(name)
+    if not match:
+        raise Http404
+    etag = f'"{name}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    elif settings.AVATAR_SENDFILE == 'x-accel-redirect':
+        response = HttpResponse(content_type=CONTENT_TYPES[match.group(1)])
+        response['X-Accel-Redirect'] = settings.AVATAR_ACCEL_REDIRECT_PREFIX + name
+    elif settings.AVATAR_SENDFILE == 'x-sendfile':
+        response = HttpResponse(content_type=CONTENT_TYPES[match.group(1)])
+        response['X-Sendfile'] = default_storage.path(f'{DIRECTORY}/{name}')
+    else:
+        path = f'{DIRECTORY}/{name}'
+        if not default_storage.exists(path):
+            raise Http404
+        response = FileResponse(default_storage.open(path, 'rb'), content_type=CONTENT_TYPES[match.group(1)])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
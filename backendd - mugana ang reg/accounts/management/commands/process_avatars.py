@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.avatars import AvatarError, set_avatar
+from accounts.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Replace avatars uploaded before processing existed with resized, metadata-free variants."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-originals', action='store_true', help="Don't delete the original files.")
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+        users = CustomUser.objects.exclude(avatar='').exclude(avatar__isnull=True).filter(avatar_variants={})
+        for user in users.iterator():
+            original = user.avatar
+            try:
+                with transaction.atomic():
+                    with original.open('rb') as upload:
+                        set_avatar(user, upload)
+                    user.save(update_fields=['avatar', 'avatar_variants'])
+            except (AvatarError, OSError) as e:
+                failed += 1
+                self.stderr.write(f"{user.email}: {e}")
+                continue
+            if not options['keep_originals'] and original.name != user.avatar.name:
+                original.storage.delete(original.name)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} avatar(s), {failed} failed."))
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from .user_cache import invalidate_user
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, name, password=None):
@@ -33,6 +34,7 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
     name = models.CharField(max_length=150)
     avatar = models.ImageField(upload_to="avatars/", null=True, blank=True)  # Aligning with frontend expectations
+    avatar_variants = models.JSONField(default=dict, blank=True)  # {size: {format: storage name}}, see accounts.avatars
     preferences = models.JSONField(default=dict, blank=True)  # Storing user preferences
     
     is_active = models.BooleanField(default=True)
@@ -45,3 +47,14 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.email
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Covers profile, preference and password updates and deactivation
+        invalidate_user(self.pk)
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        invalidate_user(user_id)
+        return result
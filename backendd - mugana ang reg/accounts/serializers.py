@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import CustomUser
 from django.contrib.auth import authenticate
+from .avatars import avatar_urls
 
 class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,9 +18,14 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 
 class UserSerializer(serializers.ModelSerializer):
+    avatar_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = CustomUser
-        fields = ["id", "name", "email", "avatar", "preferences"]  # Ensure alignment with frontend expectations
+        fields = ["id", "name", "email", "avatar", "avatar_variants", "preferences"]  # Ensure alignment with frontend expectations
+
+    def get_avatar_variants(self, obj):
+        return avatar_urls(obj)
 
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -1,3 +1,148 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CustomUser
+from .user_cache import invalidate_user
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email="owner@example.com", name="Owner", password="secret-pass-123"
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_user_row_is_only_loaded_once(self):
+        self.assertEqual(self.client.get("/api/auth/user/").status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/user/")
+        self.assertEqual(response.data["email"], "owner@example.com")
+
+    def test_profile_changes_and_deactivation_invalidate(self):
+        self.client.get("/api/auth/user/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put("/api/auth/profile/update/", {"name": "Renamed"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/api/auth/user/").data["name"], "Renamed")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get("/api/auth/user/").status_code, 401)
+
+    def test_invalidation_while_the_row_loads_is_not_lost(self):
+        load = JWTAuthentication.get_user
+
+        def load_then_deactivate(authentication, token):
+            user = load(authentication, token)
+            # Another request deactivates the user after this one read the row
+            with self.captureOnCommitCallbacks(execute=True):
+                CustomUser.objects.filter(pk=user.pk).update(is_active=False)
+                invalidate_user(user.pk)
+            return user
+
+        with mock.patch.object(JWTAuthentication, "get_user", load_then_deactivate):
+            self.assertEqual(self.client.get("/api/auth/user/").status_code, 200)
+        # The stale row was cached under the version that is now gone
+        self.assertEqual(self.client.get("/api/auth/user/").status_code, 401)
+
+
+class AvatarTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = CustomUser.objects.create_user(
+            email="owner@example.com", name="Owner", password="secret-pass-123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def photo(self, size=(1200, 800), color="red"):
+        exif = Image.Exif()
+        exif[0x010F] = "SpyCam"  # Make
+        buffer = BytesIO()
+        Image.new("RGB", size, color).save(buffer, "JPEG", exif=exif)
+        return SimpleUploadedFile("me.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+    def test_upload_produces_stripped_hashed_variants(self):
+        response = self.client.put("/api/auth/profile/update/", {"avatar": self.photo()}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+
+        variants = self.user.avatar_variants
+        self.assertEqual(set(variants), {"256", "128", "64"})
+        self.assertEqual(self.user.avatar.name, variants["256"]["jpeg"])
+        for size, formats in variants.items():
+            for format, name in formats.items():
+                self.assertRegex(name, r"^avatars/[0-9a-f]{20}-%s\.(jpg|webp)$" % size)
+                with default_storage.open(name) as f:
+                    image = Image.open(f)
+                    self.assertEqual(image.size, (int(size), int(size)))
+                    self.assertEqual(dict(image.getexif()), {})
+        self.assertEqual(response.data["user"]["avatar_variants"]["64"]["webp"], "/media/" + variants["64"]["webp"])
+
+        # Replacing the avatar removes the old files once the user is saved
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/api/auth/profile/update/", {"avatar": self.photo(color="blue")}, format="multipart")
+        self.assertFalse(default_storage.exists(variants["256"]["jpeg"]))
+
+        response = self.client.put("/api/auth/profile/update/", {
+            "avatar": SimpleUploadedFile("me.jpg", b"not an image", content_type="image/jpeg")
+        }, format="multipart")
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_save_keeps_the_old_files(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/api/auth/profile/update/", {"avatar": self.photo()}, format="multipart")
+        self.user.refresh_from_db()
+        variants = self.user.avatar_variants
+
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch.object(CustomUser, "save", side_effect=RuntimeError("database went away")):
+            response = self.client.put("/api/auth/profile/update/", {"avatar": self.photo(color="blue")}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_variants, variants)
+        self.assertTrue(default_storage.exists(variants["256"]["jpeg"]))
+
+    def test_uploading_the_same_image_keeps_its_files(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/api/auth/profile/update/", {"avatar": self.photo()}, format="multipart")
+            self.client.put("/api/auth/profile/update/", {"avatar": self.photo()}, format="multipart")
+        self.user.refresh_from_db()
+        self.assertTrue(default_storage.exists(self.user.avatar_variants["256"]["jpeg"]))
+
+    def test_serving_is_cacheable_and_can_be_offloaded(self):
+        self.client.put("/api/auth/profile/update/", {"avatar": self.photo()}, format="multipart")
+        self.user.refresh_from_db()
+        url = "/media/" + self.user.avatar_variants["128"]["webp"]
+
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        with self.settings(AVATAR_SENDFILE="x-accel-redirect"):
+            response = self.client.get(url)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/" + self.user.avatar_variants["128"]["webp"])
+        self.assertEqual(response.content, b"")
+
+        self.assertEqual(self.client.get("/media/avatars/../secret.jpg").status_code, 404)
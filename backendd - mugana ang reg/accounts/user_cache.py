@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def get_cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def version_key(user_id):
+    return f"auth-user-version:{user_id}"
+
+
+def user_key(user_id):
+    """Cache key for a user row, tied to the user's current token version."""
+    cache = get_cache()
+    version = cache.get(version_key(user_id))
+    if version is None:
+        cache.add(version_key(user_id), time.time_ns(), timeout=None)
+        version = cache.get(version_key(user_id))
+    return f"auth-user:{user_id}:{version}"
+
+
+def cache_user(user, key=None):
+    """
+    Cache a freshly loaded row. Pass the `key` read before loading it: if
+    the user is invalidated in between, the row lands under the old version
+    and is never served, rather than under the new one.
+    """
+    get_cache().set(key or user_key(user.pk), user, settings.AUTH_USER_CACHE_TTL)
+
+
+def invalidate_user(user_id):
+    """
+    Drop the cached row once the current transaction commits, by moving the
+    user to a new version so every cached copy is skipped.
+    """
+    transaction.on_commit(
+        lambda: get_cache().set(version_key(user_id), time.time_ns(), timeout=None)
+    )
@@ -11,6 +11,8 @@ from django.utils import timezone
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from django.conf import settings
+from django.db import transaction
+from .avatars import AvatarError, avatar_urls, clear_avatar, set_avatar
 
 def get_user_data(user):
     return {
@@ -18,6 +20,7 @@ def get_user_data(user):
         "email": user.email,
         "name": user.name,
         "avatar": f"{settings.MEDIA_URL}{user.avatar}" if user.avatar else None,  # ✅ Ensure full URL
+        "avatar_variants": avatar_urls(user),
         "preferences": user.preferences,
         "is_active": user.is_active,
         "is_staff": user.is_staff,
@@ -36,16 +39,21 @@ class RegisterView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        # Create user with proper password hashing
-        user = CustomUser.objects.create_user(
-            email=request.data["email"],
-            name=request.data["name"],
-            password=request.data["password"]
-        )
-
-        # Handle avatar upload (if provided)
-        if "avatar" in request.FILES:
-            user.avatar = request.FILES["avatar"]
+        try:
+            # An unusable avatar rolls the new account back
+            with transaction.atomic():
+                # Create user with proper password hashing
+                user = CustomUser.objects.create_user(
+                    email=request.data["email"],
+                    name=request.data["name"],
+                    password=request.data["password"]
+                )
+
+                # Handle avatar upload (if provided)
+                if "avatar" in request.FILES:
+                    set_avatar(user, request.FILES["avatar"])
+        except AvatarError as e:
+            return Response({"avatar": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
 
         # Initialize preferences (default settings or user-provided preferences)
         user.preferences = {
@@ -65,6 +73,7 @@ class RegisterView(generics.CreateAPIView):
                 "name": user.name,
                 "email": user.email,
                 "avatar": user.avatar.url if user.avatar else None,
+                "avatar_variants": avatar_urls(user),
                 "preferences": user.preferences,
             }
         }, status=status.HTTP_201_CREATED)
@@ -106,6 +115,7 @@ def get_user(request):
         "name": user.name,
         "email": user.email,
         "avatar": user.avatar.url if user.avatar else None,
+        "avatar_variants": avatar_urls(user),
         "preferences": user.preferences,
     })
 
@@ -122,12 +132,13 @@ def update_profile(request):
     user.email = data.get("email", user.email)
 
     # ✅ Handle avatar upload properly
-    if "avatar" in request.FILES:
-        user.avatar = request.FILES["avatar"]
-    elif data.get("remove_avatar") == "true":
-        user.avatar = None  # ✅ Allows avatar removal
+    with transaction.atomic():
+        if "avatar" in request.FILES:
+            set_avatar(user, request.FILES["avatar"])
+        elif data.get("remove_avatar") == "true":
+            clear_avatar(user)  # ✅ Allows avatar removal
 
-    user.save()
+        user.save()
 
     return Response({
         "message": "Profile updated successfully.",
@@ -181,11 +192,12 @@ def update_preferences(request):
 @permission_classes([IsAuthenticated])
 def update_profile(request):
     user = request.user
-    if 'avatar' in request.FILES:
-        user.avatar = request.FILES['avatar']
-    if 'name' in request.data:
-        user.name = request.data['name']
-    user.save()
+    with transaction.atomic():
+        if 'avatar' in request.FILES:
+            set_avatar(user, request.FILES['avatar'])
+        if 'name' in request.data:
+            user.name = request.data['name']
+        user.save()
     return Response(UserSerializer(user).data)
 
 
@@ -251,12 +263,13 @@ def update_profile(request):
         if "name" in data:
             user.name = data["name"]
 
-        if "avatar" in request.FILES:
-            user.avatar = request.FILES["avatar"]
-        elif data.get("remove_avatar") == "true":
-            user.avatar = None
+        with transaction.atomic():
+            if "avatar" in request.FILES:
+                set_avatar(user, request.FILES["avatar"])
+            elif data.get("remove_avatar") == "true":
+                clear_avatar(user)
 
-        user.save()
+            user.save()
         
         return Response({
             "message": "Profile updated successfully",
@@ -265,6 +278,12 @@ def update_profile(request):
             "success": True
         }, status=status.HTTP_200_OK)
         
+    except AvatarError as e:
+        return Response({
+            "error": str(e),
+            "success": False
+        }, status=status.HTTP_400_BAD_REQUEST)
+
     except Exception as e:
         return Response({
             "error": "Failed to update profile",
@@ -0,0 +1,177 @@
+"""
+Cold storage for old transactions.
+
+`archive()` moves a user's transactions older than a horizon out of the hot
+table into one TransactionArchive row per month: a zlib-compressed,
+column-oriented JSON payload of the rows plus per-(type, category) totals.
+MonthlyRollup buckets are left alone, so monthly reports keep covering
+archived months without reading them. The few paths that need archived
+rows or partial-month sums read through: reports.category_totals,
+exports.ledger_rows and rollups.expected_buckets. The transaction list,
+search and editing only see the hot table.
+"""
+import heapq
+import json
+import zlib
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from . import cache
+from .models import Transaction, TransactionArchive
+
+COLUMNS = ('id', 'amount', 'type', 'category', 'description', 'date', 'created_at', 'updated_at')
+DECODERS = {
+    'amount': Decimal,
+    'date': date.fromisoformat,
+    'created_at': parse_datetime,
+    'updated_at': parse_datetime,
+}
+
+
+def row_key(row):
+    return (row['date'], row['created_at'], row['id'])
+
+
+def encode(value):
+    # Full precision, unlike DjangoJSONEncoder, which drops microseconds
+    return str(value) if isinstance(value, Decimal) else value.isoformat()
+
+
+def pack(rows):
+    """Rows (dicts with COLUMNS) to the compressed payload. Columnar, since like values compress better together."""
+    columns = {name: [row[name] for row in rows] for name in COLUMNS}
+    return zlib.compress(json.dumps(columns, default=encode, separators=(',', ':')).encode(), 9)
+
+
+def unpack(payload):
+    columns = json.loads(zlib.decompress(payload))
+    values = [
+        [DECODERS[name](value) for value in columns[name]] if name in DECODERS else columns[name]
+        for name in COLUMNS
+    ]
+    return [dict(zip(COLUMNS, row)) for row in zip(*values)]
+
+
+def summarize(rows):
+    totals = defaultdict(lambda: defaultdict(lambda: [Decimal('0'), 0]))
+    for row in rows:
+        bucket = totals[row['type']][row['category']]
+        bucket[0] += row['amount']
+        bucket[1] += 1
+    return {
+        type: {category: [str(total), count] for category, (total, count) in categories.items()}
+        for type, categories in totals.items()
+    }
+
+
+def horizon(today=None, months=None):
+    """First day of the oldest month kept hot: TRANSACTION_ARCHIVE_AFTER_MONTHS whole months before this one."""
+    months = settings.TRANSACTION_ARCHIVE_AFTER_MONTHS if months is None else months
+    return (today or date.today()).replace(day=1) - relativedelta(months=months)
+
+
+def archive_month(user_id, month):
+    """Move one user's transactions in `month` into its archive row; returns how many moved."""
+    in_month = {'user_id': user_id, 'date__gte': month, 'date__lt': month + relativedelta(months=1)}
+    with transaction.atomic():
+        hot = list(Transaction.objects.select_for_update().filter(**in_month).values(*COLUMNS))
+        if not hot:
+            return 0
+        rows = hot
+        chunk = TransactionArchive.objects.select_for_update().filter(user_id=user_id, month=month).first()
+        if chunk is None:
+            chunk = TransactionArchive(user_id=user_id, month=month)
+        else:
+            # Rows added to an already archived month since the last run
+            rows = unpack(chunk.payload) + rows
+        rows.sort(key=row_key)
+        chunk.payload = pack(rows)
+        chunk.totals = summarize(rows)
+        chunk.count = len(rows)
+        chunk.save()
+
+        # Date-bounded too, so a partitioned table only touches this month's partition
+        Transaction.objects.filter(id__in=[row['id'] for row in hot], **in_month).delete()
+        # Rollups still count the rows; only list views change
+        cache.bump_version_on_commit([user_id])
+    return len(hot)
+
+
+def archive(before, user_ids=None):
+    """Archive every transaction dated before `before` (a month start). Returns {user_id: rows moved}."""
+    old = Transaction.objects.filter(date__lt=before)
+    if user_ids is not None:
+        old = old.filter(user_id__in=user_ids)
+    moved = defaultdict(int)
+    for user_id in old.values_list('user_id', flat=True).distinct().order_by('user_id'):
+        months = Transaction.objects.filter(user_id=user_id, date__lt=before).dates('date', 'month')
+        for month in months:
+            moved[user_id] += archive_month(user_id, month)
+    return dict(moved)
+
+
+def chunks(user, start_date=None, end_date=None):
+    archives = TransactionArchive.objects.filter(user=user)
+    if start_date:
+        archives = archives.filter(month__gte=start_date.replace(day=1))
+    if end_date:
+        archives = archives.filter(month__lte=end_date)
+    return archives
+
+
+def rows(user, start_date=None, end_date=None, type=None):
+    """Archived rows in an inclusive date range, oldest first (same order as the ledger export)."""
+    for chunk in chunks(user, start_date, end_date).order_by('month').iterator():
+        for row in unpack(chunk.payload):
+            if (start_date and row['date'] < start_date) or (end_date and row['date'] > end_date):
+                continue
+            if type and row['type'] != type:
+                continue
+            yield row
+
+
+def merged(hot_rows, user, start_date=None, end_date=None, type=None):
+    """Merge `hot_rows` (dicts ordered by date, created_at, id) with the archived rows in the same range."""
+    return heapq.merge(rows(user, start_date, end_date, type), hot_rows, key=row_key)
+
+
+def category_totals(user, type, ranges):
+    """{category: total} of a user's archived transactions of `type` within the inclusive (low, high) `ranges`."""
+    totals = {}
+    if not ranges:
+        return totals
+    months = {
+        month
+        for low, high in ranges
+        for month in month_span(low, high)
+    }
+    for chunk in TransactionArchive.objects.filter(user=user, month__in=months).only('payload', 'totals'):
+        if type not in chunk.totals:
+            continue
+        for row in unpack(chunk.payload):
+            if row['type'] == type and any(low <= row['date'] <= high for low, high in ranges):
+                totals[row['category']] = totals.get(row['category'], 0) + row['amount']
+    return totals
+
+
+def month_span(low, high):
+    month = low.replace(day=1)
+    while month <= high:
+        yield month
+        month += relativedelta(months=1)
+
+
+def monthly_totals(user_id):
+    """{(month, type, category): (total, count)} over a user's archive, from the stored totals."""
+    buckets = {}
+    for month, totals in TransactionArchive.objects.filter(user_id=user_id).values_list('month', 'totals'):
+        for type, categories in totals.items():
+            for category, (total, count) in categories.items():
+                buckets[(month, type, category)] = (Decimal(total), count)
+    return buckets
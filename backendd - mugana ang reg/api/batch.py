@@ -0,0 +1,162 @@
+from copy import copy
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .ledger import record_changes
+from .models import Transaction
+from .serializers import TransactionSerializer
+
+# Upper bound on operations accepted in one request
+MAX_BATCH_OPERATIONS = 1000
+
+EDITABLE_FIELDS = ('amount', 'type', 'category', 'description', 'date')
+
+
+class BatchError(Exception):
+    """The request as a whole is malformed (not a per-operation problem)."""
+
+
+def row_date(op):
+    try:
+        return parse_date(op['date'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def validate_operations(user, operations):
+    """
+    Validate every operation against the user's current rows. Returns
+    (plan, results) where results holds an error entry for each invalid
+    operation; the plan is only usable when there are none.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BatchError("'operations' must be a non-empty list")
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise BatchError(f"At most {MAX_BATCH_OPERATIONS} operations are allowed per batch")
+
+    targets = [
+        op for op in operations
+        if isinstance(op, dict) and op.get('op') in ('update', 'delete') and op.get('id') is not None
+    ]
+    ids = {str(op['id']) for op in targets}
+    rows = Transaction.objects.select_for_update().filter(user=user, id__in=[i for i in ids if i.isdigit()])
+    # The rows' current dates, when the client sends them, let a partitioned
+    # table skip the partitions they can't be in
+    dates = [row_date(op) for op in targets]
+    if targets and all(dates):
+        rows = rows.filter(date__in=set(dates))
+    existing = {str(txn.pk): txn for txn in rows}
+
+    plan = {'create': [], 'update': [], 'delete': []}
+    results, seen = [], set()
+    for index, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+        result = {'index': index, 'op': kind}
+        results.append(result)
+
+        if kind not in plan:
+            result.update(status='error', errors={'op': ["Must be one of: create, update, delete."]})
+            continue
+
+        data = op.get('data') or {}
+        if kind != 'create':
+            txn = existing.get(str(op.get('id')))
+            if txn is None:
+                result.update(status='error', errors={'id': ["Transaction not found."]})
+                continue
+            if txn.pk in seen:
+                result.update(status='error', errors={'id': ["Transaction appears in more than one operation."]})
+                continue
+            seen.add(txn.pk)
+            result['id'] = txn.pk
+
+        if kind == 'delete':
+            plan['delete'].append((index, txn))
+            continue
+
+        if not isinstance(data, dict):
+            result.update(status='error', errors={'data': ["Must be an object."]})
+            continue
+
+        if kind == 'update':
+            # Validate the merged row so partial updates (e.g. just a new
+            # category) still go through the full type/category rules
+            merged = {field: getattr(txn, field) for field in EDITABLE_FIELDS}
+            merged.update({field: data[field] for field in EDITABLE_FIELDS if field in data})
+            serializer = TransactionSerializer(data=merged)
+        else:
+            serializer = TransactionSerializer(data=data)
+
+        if not serializer.is_valid():
+            result.update(status='error', errors=serializer.errors)
+            continue
+
+        if kind == 'update':
+            changes = {field: serializer.validated_data[field] for field in EDITABLE_FIELDS if field in data}
+            plan['update'].append((index, txn, changes))
+        else:
+            plan['create'].append((index, serializer.validated_data))
+
+    return plan, results
+
+
+def apply_plan(user, plan, results):
+    """
+    Apply a validated plan with one DELETE, one UPDATE per distinct set of
+    changes and one bulk INSERT.
+    """
+    added, removed = [], []
+
+    deletes = plan['delete']
+    if deletes:
+        Transaction.objects.filter(
+            user=user, id__in=[txn.pk for _, txn in deletes], date__in={txn.date for _, txn in deletes}
+        ).delete()
+        for index, txn in deletes:
+            removed.append(txn)
+            results[index]['status'] = 'ok'
+
+    groups = {}
+    for index, txn, changes in plan['update']:
+        key = tuple(sorted(changes.items()))
+        groups.setdefault(key, []).append((index, txn))
+    now = timezone.now()
+    for key, members in groups.items():
+        changes = dict(key)
+        Transaction.objects.filter(
+            user=user, id__in=[txn.pk for _, txn in members], date__in={txn.date for _, txn in members}
+        ).update(updated_at=now, **changes)
+        for index, txn in members:
+            updated = copy(txn)
+            for field, value in changes.items():
+                setattr(updated, field, value)
+            updated.updated_at = now
+            removed.append(txn)
+            added.append(updated)
+            results[index].update(status='ok', data=TransactionSerializer(updated).data)
+
+    creates = plan['create']
+    if creates:
+        saved = Transaction.objects.bulk_create([Transaction(user=user, **values) for _, values in creates])
+        for (index, _), txn in zip(creates, saved):
+            added.append(txn)
+            results[index].update(status='ok', id=txn.pk, data=TransactionSerializer(txn).data)
+
+    record_changes(added=added, removed=removed)
+
+
+def run_batch(user, operations):
+    """
+    Validate and apply a batch in one DB transaction. Either every
+    operation is applied or none is. Returns (ok, results).
+    """
+    with transaction.atomic():
+        plan, results = validate_operations(user, operations)
+        if any(result.get('status') == 'error' for result in results):
+            for result in results:
+                result.setdefault('status', 'skipped')
+            return False, results
+        apply_plan(user, plan, results)
+    return True, results
@@ -0,0 +1,97 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+
+from . import archive
+from .models import Budget, BudgetAlert, Transaction
+
+# Most recent alerts returned by /api/budgets/alerts/
+ALERTS_LIMIT = 100
+
+
+def apply_changes(added=(), removed=()):
+    """
+    Fold added/removed expenses into the `spent` of every budget whose
+    category and window they fall in, then record any alert thresholds that
+    were crossed. Called by ledger.record_changes inside the write's atomic
+    block; costs one budget lookup per (user, category) touched.
+    """
+    amounts = defaultdict(list)
+    for txn, sign in [(txn, 1) for txn in added] + [(txn, -1) for txn in removed]:
+        if txn.type == 'expense':
+            amounts[(txn.user_id, txn.category)].append((txn.date, sign * txn.amount))
+
+    touched = []
+    for (user_id, category), changes in amounts.items():
+        dates = [on for on, _ in changes]
+        budgets = Budget.objects.filter(
+            user_id=user_id, category=category, start_date__lte=max(dates), end_date__gte=min(dates)
+        ).values_list('id', 'start_date', 'end_date')
+        for budget_id, start_date, end_date in budgets:
+            delta = sum((amount for on, amount in changes if start_date <= on <= end_date), Decimal('0'))
+            if delta:
+                Budget.objects.filter(pk=budget_id).update(spent=F('spent') + delta)
+                touched.append(budget_id)
+    if touched:
+        evaluate(touched)
+
+
+def spent(budget):
+    """Expenses in a budget's category and window, from the hot table and the archive."""
+    hot = Transaction.objects.filter(
+        user_id=budget.user_id,
+        type='expense',
+        category=budget.category,
+        date__gte=budget.start_date,
+        date__lte=budget.end_date
+    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    archived = archive.category_totals(budget.user_id, 'expense', [(budget.start_date, budget.end_date)])
+    return hot + archived.get(budget.category, Decimal('0'))
+
+
+def recompute(budget):
+    """Recount `budget.spent` from scratch, e.g. after its category, window or amount changed."""
+    with transaction.atomic():
+        # The row lock orders this after any in-flight delta for the budget
+        Budget.objects.select_for_update().filter(pk=budget.pk).exists()
+        budget.spent = spent(budget)
+        Budget.objects.filter(pk=budget.pk).update(spent=budget.spent)
+        evaluate([budget.pk])
+    return budget.spent
+
+
+def evaluate(budget_ids):
+    """
+    Record a BudgetAlert for each BUDGET_ALERT_THRESHOLDS percentage a
+    budget's spend has reached, once per budget and threshold, for users
+    whose `budget_alerts` preference is on. Alerts for thresholds the spend
+    has dropped back below are removed, so crossing again alerts again.
+    """
+    budgets = Budget.objects.filter(pk__in=budget_ids).select_related('user')
+    existing = defaultdict(set)
+    for budget_id, threshold in BudgetAlert.objects.filter(budget_id__in=budget_ids).values_list('budget_id', 'threshold'):
+        existing[budget_id].add(threshold)
+
+    new, cleared = [], []
+    for budget in budgets:
+        reached = {
+            threshold for threshold in settings.BUDGET_ALERT_THRESHOLDS
+            if budget.spent * 100 >= budget.amount * threshold
+        }
+        cleared += [(budget.pk, threshold) for threshold in existing[budget.pk] - reached]
+        if not (budget.user.preferences or {}).get('budget_alerts', True):
+            continue
+        new += [
+            BudgetAlert(
+                user_id=budget.user_id, budget=budget, threshold=threshold, spent=budget.spent, amount=budget.amount
+            )
+            for threshold in sorted(reached - existing[budget.pk])
+        ]
+
+    for budget_id, threshold in cleared:
+        BudgetAlert.objects.filter(budget_id=budget_id, threshold=threshold).delete()
+    # A concurrent write may have recorded the same crossing
+    BudgetAlert.objects.bulk_create(new, ignore_conflicts=True)
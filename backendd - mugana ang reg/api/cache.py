@@ -0,0 +1,113 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+MISSING = object()
+
+
+def get_cache():
+    return caches[settings.REPORT_CACHE_ALIAS]
+
+
+def version_key(user_id):
+    return f"data-version:{user_id}"
+
+
+def data_version(user_id):
+    """
+    Current version of a user's data. Any Transaction or Budget write
+    replaces it, which orphans every cached entry built from the old data
+    in O(1) instead of deleting them one by one.
+    """
+    cache = get_cache()
+    version = cache.get(version_key(user_id))
+    if version is None:
+        # Lost to eviction or never set: start a new version so nothing
+        # cached under an older one can be served
+        cache.add(version_key(user_id), time.time_ns(), timeout=None)
+        version = cache.get(version_key(user_id))
+    return version
+
+
+def bump_version(user_id):
+    get_cache().set(version_key(user_id), time.time_ns(), timeout=None)
+    pin_to_primary(user_id)
+
+
+def pin_key(user_id):
+    return f"db-pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """
+    Route this user's reads to the primary database for the next
+    REPLICA_PIN_SECONDS, so nothing they see lags behind their own write
+    (see api.routers). A no-op without replicas.
+    """
+    if settings.DATABASE_REPLICAS:
+        get_cache().set(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def pinned_to_primary(user_id):
+    return bool(get_cache().get(pin_key(user_id)))
+
+
+def bump_version_on_commit(user_ids):
+    """
+    Call inside the transaction of any write to a user's transactions or
+    budgets: stamps the change in the database now (api.stamps) and
+    replaces the cache version once it commits.
+    """
+    from . import stamps
+
+    user_ids = set(user_ids)
+    stamps.touch(user_ids)
+    for user_id in user_ids:
+        # Pinned now as well as on commit, so there is no gap in between
+        pin_to_primary(user_id)
+        transaction.on_commit(lambda user_id=user_id: bump_version(user_id))
+
+
+def record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats():
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def cached_for_user(user_id, kind, params, compute, timeout=None):
+    """
+    Return compute() for this user, report kind and parameters, reusing the
+    cached value for as long as the user's data version is unchanged.
+    compute() must return something picklable (lists/dicts, not querysets).
+    """
+    cache = get_cache()
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    key = f"report:{user_id}:{data_version(user_id)}:{kind}:{digest}"
+
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        record('hits')
+        return value
+
+    record('misses')
+    value = compute()
+    cache.set(key, value, settings.REPORT_CACHE_TIMEOUT if timeout is None else timeout)
+    return value
@@ -0,0 +1,60 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import stamps
+
+
+def conditional(dated=False):
+    """
+    Answer If-None-Match / If-Modified-Since with 304 before the handler runs.
+
+    The validators come from the user's DataStamp (api.stamps): one primary
+    key lookup, whatever the size of the ledger, bumped in the same
+    transaction as every transaction or budget write, deletes included. The
+    ETag also covers the URL and query string, so each page/filter gets its
+    own, and the Accept header, since JSON and MessagePack are served from
+    the same URL.
+
+    `dated` views depend on today's date as well (month-to-date figures):
+    the ETag includes it and Last-Modified is at least the start of today,
+    so nothing cached yesterday is revalidated as current.
+    """
+    def state(request):
+        # Computed once and shared by the ETag and Last-Modified callbacks
+        if not hasattr(request, '_conditional_state'):
+            user = request.user
+            version, changed_at = stamps.current(user.pk)
+            modified = [changed_at] if changed_at else []
+            parts = [str(user.pk), request.get_full_path(), request.headers.get('Accept', ''), str(version)]
+            if dated:
+                today = timezone.localdate()
+                parts.append(today.isoformat())
+                modified.append(timezone.make_aware(datetime.combine(today, datetime.min.time())))
+            request._conditional_state = {
+                'etag': hashlib.sha1(':'.join(parts).encode()).hexdigest(),
+                'last_modified': max(modified) if modified else None,
+            }
+        return request._conditional_state
+
+    def etag_func(request, *args, **kwargs):
+        return state(request)['etag']
+
+    def last_modified_func(request, *args, **kwargs):
+        return state(request)['last_modified']
+
+    def decorator(view):
+        conditioned = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            response = conditioned(request, *args, **kwargs)
+            # Validators are per user and per representation
+            patch_vary_headers(response, ('Authorization', 'Accept'))
+            return response
+        return inner
+    return decorator
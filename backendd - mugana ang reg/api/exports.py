@@ -0,0 +1,97 @@
+import csv
+from io import BytesIO
+
+from django.http import StreamingHttpResponse
+from reportlab.pdfgen import canvas
+
+from . import archive
+from .models import Transaction
+
+# Rows fetched per round trip when streaming the ledger
+LEDGER_CHUNK_SIZE = 2000
+
+LEDGER_COLUMNS = [
+    ('Date', 'date'),
+    ('Type', 'type'),
+    ('Category', 'category'),
+    ('Amount', 'amount'),
+    ('Description', 'description'),
+]
+
+REPORT_COLUMNS = {
+    'spending': [('Category', 'category'), ('Amount', 'total')],
+    'income': [('Category', 'category'), ('Amount', 'total')],
+    'trends': [('Month', 'month'), ('Type', 'type'), ('Amount', 'total')],
+}
+
+
+class Echo:
+    """File-like object whose write() hands the formatted line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    # The header goes out before the first row is fetched
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_csv(header, rows, filename):
+    """
+    Stream `rows` (any iterable of sequences) as a CSV attachment. Memory
+    stays flat regardless of row count as long as `rows` is lazy.
+    """
+    response = StreamingHttpResponse(csv_lines(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def report_rows(data, columns):
+    return ([row[key] for _, key in columns] for row in data)
+
+
+def write_csv(file, header, rows):
+    """Write header and rows to a text file, one row at a time."""
+    writer = csv.writer(file)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+
+
+def render_pdf(title, data, columns):
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer)
+    y = 800
+    p.drawString(100, y, title)
+    y -= 20
+    for values in report_rows(data, columns):
+        *labels, amount = values
+        p.drawString(100, y, f"{' '.join(str(label) for label in labels)}: {amount}")
+        y -= 15
+        if y < 50:
+            p.showPage()
+            y = 800
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def ledger_rows(user, start_date=None, end_date=None, type=None):
+    transactions = Transaction.objects.filter(user=user)
+    if start_date:
+        transactions = transactions.filter(date__gte=start_date)
+    if end_date:
+        transactions = transactions.filter(date__lte=end_date)
+    if type:
+        transactions = transactions.filter(type=type)
+
+    fields = [field for _, field in LEDGER_COLUMNS]
+    hot = transactions.order_by('date', 'created_at', 'id').values(
+        *fields, 'created_at', 'id'
+    ).iterator(chunk_size=LEDGER_CHUNK_SIZE)
+    # Archived rows are interleaved in ledger order, one month at a time
+    return ([row[field] for field in fields] for row in archive.merged(hot, user, start_date, end_date, type))
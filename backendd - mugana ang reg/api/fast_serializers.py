@@ -0,0 +1,85 @@
+from decimal import Decimal
+
+from django.db import models
+from django.utils import timezone
+from rest_framework import serializers
+
+
+def decimal_converter(field):
+    # Same output as DRF's DecimalField with COERCE_DECIMAL_TO_STRING
+    quantum = Decimal(1).scaleb(-field.decimal_places)
+    return lambda value: f'{value.quantize(quantum):f}'
+
+
+def datetime_converter(field):
+    # Same output as DRF's DateTimeField: current time zone, 'Z' for UTC
+    def convert(value):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        text = value.isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return convert
+
+
+def date_converter(field):
+    return lambda value: value.isoformat()
+
+
+CONVERTERS = [
+    (models.DecimalField, decimal_converter),
+    # Before DateField, which it subclasses
+    (models.DateTimeField, datetime_converter),
+    (models.DateField, date_converter),
+]
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer over rows from `.values()`.
+
+    Produces the same JSON as the matching ModelSerializer without building
+    model instances or running DRF field machinery per row: each field's
+    converter is looked up once, then every row is a single dict build.
+    `extra_converters` covers annotations (None means pass through as is).
+    """
+    model = None
+    fields = ()
+    extra_converters = {}
+    fields_query_param = 'fields'
+
+    def __init__(self, fields=None):
+        if fields:
+            unknown = set(fields) - set(self.fields)
+            if unknown:
+                raise serializers.ValidationError({self.fields_query_param: f"Unknown field(s): {', '.join(sorted(unknown))}"})
+            self.fields = [name for name in self.fields if name in fields]
+        self.converters = [(name, self.converter(name)) for name in self.fields]
+
+    @classmethod
+    def from_request(cls, request):
+        """Honour ?fields=a,b,c; unknown names are a 400 (ValidationError)."""
+        selected = request.query_params.get(cls.fields_query_param)
+        return cls([name for name in selected.split(',') if name] if selected else None)
+
+    def converter(self, name):
+        if name in self.extra_converters:
+            return self.extra_converters[name]
+        field = self.model._meta.get_field(name)
+        for field_class, factory in CONVERTERS:
+            if isinstance(field, field_class):
+                return factory(field)
+        return None
+
+    def columns(self, *extra):
+        """Names to pass to .values(): the selected fields plus `extra` (e.g. keyset columns)."""
+        return list(dict.fromkeys([*self.fields, *extra]))
+
+    def to_representation(self, rows):
+        converters = self.converters
+        return [
+            {
+                name: row[name] if convert is None or row[name] is None else convert(row[name])
+                for name, convert in converters
+            }
+            for row in rows
+        ]
@@ -0,0 +1,16 @@
+def filter_transactions(queryset, start_date=None, end_date=None, type=None, categories=None,
+                        min_amount=None, max_amount=None):
+    """Apply the transaction list/search filters; every argument is optional."""
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    if type:
+        queryset = queryset.filter(type=type)
+    if categories:
+        queryset = queryset.filter(category__in=categories)
+    if min_amount is not None:
+        queryset = queryset.filter(amount__gte=min_amount)
+    if max_amount is not None:
+        queryset = queryset.filter(amount__lte=max_amount)
+    return queryset
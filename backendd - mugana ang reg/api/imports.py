@@ -0,0 +1,130 @@
+import csv
+import io
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .ledger import record_changes
+from .models import Transaction
+
+# Rows validated and inserted per round trip
+IMPORT_BATCH_SIZE = 1000
+# Cap on the per-row error report so a bad file can't produce a huge response
+MAX_REPORTED_ERRORS = 500
+
+IMPORT_FIELDS = ('amount', 'type', 'category', 'date')
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def parse_csv(file):
+    """
+    Yield (row_number, row) from a CSV upload with a header row naming
+    date, type, category, amount and (optionally) description.
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, row
+
+
+def parse_ofx(file, expense_category='other', income_category='other'):
+    """
+    Yield (row_number, row) for each <STMTTRN> in an OFX upload, read line
+    by line. Debits become expenses and credits income; OFX carries no
+    category so the given defaults are used.
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8', errors='replace')
+    number, current = 0, None
+    for line in text:
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if not closing:
+                    current = {}
+                elif current is not None:
+                    number += 1
+                    yield number, ofx_row(current, expense_category, income_category)
+                    current = None
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+
+
+def ofx_row(fields, expense_category, income_category):
+    amount = fields.get('TRNAMT', '')
+    posted = fields.get('DTPOSTED', '')
+    negative = amount.startswith('-')
+    return {
+        'amount': amount.lstrip('+-'),
+        'type': 'expense' if negative else 'income',
+        'category': expense_category if negative else income_category,
+        'date': f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}" if len(posted) >= 8 else posted,
+        'description': ' '.join(filter(None, [fields.get('NAME'), fields.get('MEMO')])),
+    }
+
+
+def clean_row(row):
+    """
+    Validate one row with the model field rules plus the
+    TransactionSerializer type/category rule. Returns (values, errors).
+    """
+    values, errors = {}, {}
+    for name in IMPORT_FIELDS:
+        raw = (row.get(name) or '').strip()
+        if not raw:
+            errors[name] = ["This field is required."]
+            continue
+        try:
+            values[name] = Transaction._meta.get_field(name).clean(raw, None)
+        except ValidationError as e:
+            errors[name] = e.messages
+    values['description'] = (row.get('description') or '').strip()
+
+    if not errors:
+        error = Transaction.category_error(values['type'], values['category'])
+        if error:
+            errors['non_field_errors'] = [error]
+    return values, errors
+
+
+@transaction.atomic
+def import_transactions(user, rows):
+    """
+    Validate and insert rows in batches of IMPORT_BATCH_SIZE with
+    bulk_create. Invalid rows are skipped and reported. The whole import is
+    one transaction: if the file turns out to be unreadable part way
+    through (UnicodeDecodeError, csv.Error), nothing from it is kept, so
+    retrying the upload can't duplicate rows.
+    """
+    created, failed, errors = 0, 0, []
+
+    def flush(batch):
+        saved = Transaction.objects.bulk_create(batch)
+        record_changes(added=saved)
+        return len(saved)
+
+    batch = []
+    for number, row in rows:
+        values, row_errors = clean_row(row)
+        if row_errors:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'row': number, 'errors': row_errors})
+            continue
+
+        batch.append(Transaction(user=user, **values))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            created += flush(batch)
+            batch = []
+    if batch:
+        created += flush(batch)
+
+    return {
+        'created': created,
+        'failed': failed,
+        'errors': errors,
+        'errors_truncated': failed > len(errors),
+    }
@@ -0,0 +1,198 @@
+import hashlib
+import io
+import json
+import logging
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import rollups, stamps
+from .exports import LEDGER_COLUMNS, REPORT_COLUMNS, ledger_rows, render_pdf, report_rows, write_csv
+from .models import Job
+from .reports import REPORT_FILENAMES, build_report, parse_report_date
+
+logger = logging.getLogger(__name__)
+
+
+def dedupe_key(user, kind, params):
+    # The stamp version changes on every write (in the database, so every
+    # worker agrees), so an artifact built from older data is never handed
+    # out for a new request
+    version, _ = stamps.current(user.pk)
+    payload = json.dumps({'user': user.pk, 'kind': kind, 'params': params, 'version': version}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def enqueue(user, kind, params):
+    """
+    Queue a job, or return the identical one that is still queued, running
+    or holding an unexpired artifact. Returns (job, created).
+    """
+    key = dedupe_key(user, kind, params)
+    while True:
+        existing = Job.objects.filter(dedupe_key=key).filter(
+            Q(status__in=['pending', 'running']) | Q(status='done', expires_at__gt=timezone.now())
+        ).order_by('-created_at').first()
+        if existing:
+            return existing, False
+        try:
+            with transaction.atomic():
+                return Job.objects.create(user=user, kind=kind, params=params, dedupe_key=key), True
+        except IntegrityError:
+            # A concurrent request queued the same job first (api_job_active_uniq)
+            continue
+
+
+def claim_next():
+    """
+    Atomically move the oldest pending job to running. The conditional
+    UPDATE makes the claim safe across worker processes without an external
+    broker or backend-specific row locking.
+    """
+    while True:
+        job_id = Job.objects.filter(status='pending').order_by('created_at').values_list('pk', flat=True).first()
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(pk=job_id, status='pending').update(
+            status='running', started_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+
+
+def run_job(job):
+    """
+    Run a claimed job and record the outcome. Anything that goes wrong,
+    including storing the artifact or saving the job, marks it failed: a
+    job left `running` would block retries of the same request through
+    api_job_active_uniq.
+    """
+    try:
+        artifact = HANDLERS[job.kind](job)
+        if artifact is not None:
+            extension, content = artifact
+            try:
+                job.result.save(f"{job.kind}-{job.pk}{extension}", content, save=False)
+            finally:
+                content.close()
+        job.status = 'done'
+        job.error = ''
+        job.expires_at = timezone.now() + settings.JOB_ARTIFACT_TTL
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'result', 'finished_at', 'expires_at'])
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job.pk, job.kind)
+        fail(job, str(e))
+    return job
+
+
+def fail(job, error):
+    if job.result:
+        try:
+            job.result.delete(save=False)
+        except Exception:
+            logger.exception("Could not delete the artifact of failed job %s", job.pk)
+    job.status = 'failed'
+    job.error = error
+    job.expires_at = None
+    job.finished_at = timezone.now()
+    # A plain UPDATE, independent of whatever state the instance save left behind
+    Job.objects.filter(pk=job.pk).update(
+        status=job.status, error=job.error, result='', expires_at=None, finished_at=job.finished_at
+    )
+
+
+def requeue_stale():
+    """Put back jobs whose worker died mid-run, failing them once out of attempts."""
+    stale = Job.objects.filter(status='running', started_at__lt=timezone.now() - settings.JOB_STALE_AFTER)
+    stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+        status='failed', error='Worker stopped before the job finished', finished_at=timezone.now()
+    )
+    stale.update(status='pending', started_at=None)
+
+
+def purge_expired():
+    expired = Job.objects.filter(
+        Q(status='done', expires_at__lt=timezone.now()) |
+        Q(status='failed', finished_at__lt=timezone.now() - settings.JOB_ARTIFACT_TTL)
+    )
+    for job in expired.iterator():
+        if job.result:
+            job.result.delete(save=False)
+        job.delete()
+
+
+def work(once=False, poll_interval=None):
+    """Worker loop: run jobs until the queue is empty (once) or forever."""
+    poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    while True:
+        job = claim_next()
+        if job is not None:
+            run_job(job)
+            continue
+        if once:
+            return
+        requeue_stale()
+        purge_expired()
+        time.sleep(poll_interval)
+
+
+def report_params(job):
+    params = job.params
+    return (
+        params['report_type'],
+        parse_report_date(params.get('start_date')),
+        parse_report_date(params.get('end_date')),
+    )
+
+
+def run_report_pdf(job):
+    report_type, start_date, end_date = report_params(job)
+    data = build_report(job.user, report_type, start_date, end_date)
+    return '.pdf', ContentFile(render_pdf(REPORT_FILENAMES[report_type], data, REPORT_COLUMNS[report_type]))
+
+
+def run_report_csv(job):
+    report_type, start_date, end_date = report_params(job)
+    columns = REPORT_COLUMNS[report_type]
+    data = build_report(job.user, report_type, start_date, end_date)
+    buffer = io.StringIO()
+    write_csv(buffer, [title for title, _ in columns], report_rows(data, columns))
+    return '.csv', ContentFile(buffer.getvalue().encode())
+
+
+def run_ledger_csv(job):
+    params = job.params
+    rows = ledger_rows(
+        job.user,
+        parse_report_date(params.get('start_date')),
+        parse_report_date(params.get('end_date')),
+        params.get('type')
+    )
+    # Spool to disk so large ledgers never sit in memory
+    spool = tempfile.TemporaryFile()
+    text = io.TextIOWrapper(spool, encoding='utf-8', newline='')
+    write_csv(text, [title for title, _ in LEDGER_COLUMNS], rows)
+    text.flush()
+    text.detach()
+    spool.seek(0)
+    return '.csv', File(spool)
+
+
+def run_rebuild_rollups(job):
+    rollups.rebuild(job.user_id)
+    return None
+
+
+HANDLERS = {
+    'report_csv': run_report_csv,
+    'report_pdf': run_report_pdf,
+    'ledger_csv': run_ledger_csv,
+    'rebuild_rollups': run_rebuild_rollups,
+}
@@ -0,0 +1,23 @@
+from copy import copy
+
+from . import budgets, cache, rollups
+
+
+def snapshot(txn):
+    """Copy of a transaction as it is now, for use as a `removed` entry before it is modified."""
+    return copy(txn)
+
+
+def record_changes(added=(), removed=()):
+    """
+    Keep data derived from Transaction rows in step with a write.
+
+    Every path that creates, updates or deletes transactions (single-row
+    views as well as bulk paths) calls this inside the same atomic block as
+    the write. Updates pass the old snapshot as removed and the saved row as
+    added.
+    """
+    added, removed = list(added), list(removed)
+    rollups.apply_changes(added, removed)
+    budgets.apply_changes(added, removed)
+    cache.bump_version_on_commit(txn.user_id for txn in added + removed)
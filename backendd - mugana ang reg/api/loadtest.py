@@ -0,0 +1,297 @@
+import json
+import math
+import random
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from .models import Budget, MonthlyRollup, Transaction
+
+# Generated accounts all live under this domain so they are easy to find
+# (and to delete) without touching real users
+EMAIL_DOMAIN = 'loadtest.invalid'
+DEFAULT_PASSWORD = 'loadtest-password'
+
+# Rough shape of a personal ledger: (category, weight, typical amount)
+EXPENSE_MIX = [
+    ('food', 40, 25),
+    ('transportation', 20, 15),
+    ('shopping', 15, 60),
+    ('entertainment', 12, 30),
+    ('utilities', 8, 120),
+    ('other', 5, 40),
+]
+INCOME_MIX = [
+    ('salary', 70, 2500),
+    ('business', 12, 800),
+    ('investment', 10, 300),
+    ('gift', 8, 100),
+]
+INCOME_SHARE = 0.08
+
+
+def pick(rng, mix):
+    category, _, typical = rng.choices(mix, weights=[weight for _, weight, _ in mix])[0]
+    # Log-normal around the typical amount: mostly small, a few large
+    amount = Decimal(str(round(typical * rng.lognormvariate(0, 0.6), 2))).max(Decimal('0.50'))
+    return category, amount
+
+
+def month_start(day, months_back=0):
+    month = day.month - 1 - months_back
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def generate(users, transactions_per_user, budgets_per_user, months=12, seed=None,
+             password=DEFAULT_PASSWORD, batch_size=5000, progress=None):
+    """
+    Bulk-insert synthetic users with transactions, budgets and matching
+    monthly rollups. Returns the number of rows created per model.
+
+    Users are written in chunks of about `batch_size` transactions, each
+    chunk in its own atomic block, so memory stays flat at any scale.
+    """
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    first_day = today - timedelta(days=months * 30)
+    span = (today - first_day).days
+    # Hashing is deliberately slow; every generated user shares one hash
+    password_hash = make_password(password)
+    offset = CustomUser.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').count()
+    users_per_chunk = max(1, batch_size // max(1, transactions_per_user))
+    created = {'users': 0, 'transactions': 0, 'budgets': 0, 'rollups': 0}
+
+    for chunk_start in range(0, users, users_per_chunk):
+        chunk = range(chunk_start, min(users, chunk_start + users_per_chunk))
+        with transaction.atomic():
+            accounts = CustomUser.objects.bulk_create([
+                CustomUser(
+                    email=f'user{offset + n}@{EMAIL_DOMAIN}',
+                    name=f'Load User {offset + n}',
+                    password=password_hash,
+                    preferences={'currency': 'USD', 'email_alerts': True, 'weekly_reports': False, 'budget_alerts': True},
+                )
+                for n in chunk
+            ])
+
+            rows = []
+            buckets = defaultdict(lambda: [Decimal('0'), 0])
+            for account in accounts:
+                for _ in range(transactions_per_user):
+                    type = 'income' if rng.random() < INCOME_SHARE else 'expense'
+                    category, amount = pick(rng, INCOME_MIX if type == 'income' else EXPENSE_MIX)
+                    on = first_day + timedelta(days=rng.randrange(span + 1))
+                    rows.append(Transaction(
+                        user=account, amount=amount, type=type, category=category, date=on,
+                        description=f'{category} #{rng.randrange(10000)}',
+                    ))
+                    bucket = buckets[(account.pk, on.replace(day=1), type, category)]
+                    bucket[0] += amount
+                    bucket[1] += 1
+            Transaction.objects.bulk_create(rows, batch_size=batch_size)
+
+            budgets = []
+            for account in accounts:
+                for n in range(budgets_per_user):
+                    start = month_start(today, n // len(EXPENSE_MIX))
+                    category = EXPENSE_MIX[n % len(EXPENSE_MIX)][0]
+                    budgets.append(Budget(
+                        user=account,
+                        category=category,
+                        amount=Decimal(rng.randrange(100, 1000)),
+                        period='monthly',
+                        start_date=start,
+                        end_date=month_start(start, -1) - timedelta(days=1),
+                        # A whole month, so its bucket is exactly the spend
+                        spent=buckets.get((account.pk, start, 'expense', category), [Decimal('0')])[0],
+                    ))
+            Budget.objects.bulk_create(budgets, batch_size=batch_size)
+
+            # Written directly rather than through ledger.record_changes: the
+            # buckets are new, so one insert per bucket beats an UPDATE attempt
+            MonthlyRollup.objects.bulk_create([
+                MonthlyRollup(user_id=user_id, month=month, type=type, category=category, total=total, count=count)
+                for (user_id, month, type, category), (total, count) in buckets.items()
+            ], batch_size=batch_size)
+
+        created['users'] += len(accounts)
+        created['transactions'] += len(rows)
+        created['budgets'] += len(budgets)
+        created['rollups'] += len(buckets)
+        if progress:
+            progress(created)
+    return created
+
+
+def create_payload(rng):
+    category, amount = pick(rng, EXPENSE_MIX)
+    return {
+        'amount': str(amount), 'type': 'expense', 'category': category,
+        'date': timezone.localdate().isoformat(), 'description': 'benchmark',
+    }
+
+
+# name -> (method, path, payload factory); run in this order every round
+ENDPOINTS = {
+    'login': ('POST', '/api/auth/login/', None),
+    'transactions_list': ('GET', '/api/transactions/', None),
+    'transactions_create': ('POST', '/api/transactions/', create_payload),
+    'budgets': ('GET', '/api/budgets/', None),
+    'report_spending': ('GET', '/api/reports/spending/', None),
+    'report_income': ('GET', '/api/reports/income/', None),
+    'report_trends': ('GET', '/api/reports/trends/', None),
+    'dashboard': ('GET', '/api/dashboard/summary/', None),
+}
+
+
+class InProcessClient:
+    """Calls the app through Django's test client; also counts queries."""
+
+    def __init__(self, host):
+        self.client = Client(HTTP_HOST=host)
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        with CaptureQueriesContext(connection) as queries:
+            if method == 'GET':
+                response = self.client.get(path, headers=headers)
+            else:
+                response = self.client.generic(
+                    method, path, json.dumps(data or {}), content_type='application/json', headers=headers
+                )
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, body, len(queries)
+
+    def close(self):
+        connections.close_all()
+
+
+class HTTPClient:
+    """Calls a running server; query counts are not visible from here."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None, token=None):
+        request = urllib.request.Request(
+            self.base_url + path, method=method,
+            data=json.dumps(data or {}).encode() if method != 'GET' else None,
+            headers={'Content-Type': 'application/json', **({'Authorization': f'Bearer {token}'} if token else {})},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.read(), None
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), None
+
+    def close(self):
+        pass
+
+
+def run_rounds(client, rounds, emails, password, endpoints, seed):
+    """One virtual user: each round logs in as a random account and calls every endpoint."""
+    rng = random.Random(seed)
+    samples = defaultdict(list)
+    try:
+        for _ in range(rounds):
+            token = None
+            for name, (method, path, payload) in ENDPOINTS.items():
+                if name == 'login':
+                    data = {'email': rng.choice(emails), 'password': password}
+                elif name in endpoints:
+                    data = payload(rng) if payload else None
+                else:
+                    continue
+                started = time.perf_counter()
+                status, body, queries = client.request(method, path, data, token)
+                elapsed = (time.perf_counter() - started) * 1000
+                if name == 'login':
+                    token = json.loads(body).get('token') if status == 200 else None
+                    if name not in endpoints:
+                        continue
+                samples[name].append((elapsed, queries, status < 400))
+    finally:
+        client.close()
+    return samples
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(samples, wall_time):
+    latencies = sorted(elapsed for elapsed, _, _ in samples)
+    queries = [count for _, count, _ in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, ok in samples if not ok),
+        'throughput_rps': round(len(samples) / wall_time, 2) if wall_time else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'mean': round(sum(latencies) / len(latencies), 2),
+            'max': round(latencies[-1], 2),
+        },
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def run_benchmark(rounds, concurrency=1, endpoints=None, emails=None, password=DEFAULT_PASSWORD,
+                  base_url=None, host='localhost', seed=None):
+    """
+    Drive the endpoints for `rounds` rounds split across `concurrency`
+    virtual users and return a JSON-serializable report.
+    """
+    endpoints = list(endpoints or ENDPOINTS)
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+    if not emails:
+        raise ValueError('No accounts to log in as; run seed_load_data first')
+
+    def make_client():
+        return HTTPClient(base_url) if base_url else InProcessClient(host)
+
+    shares = [rounds // concurrency + (1 if n < rounds % concurrency else 0) for n in range(concurrency)]
+    started = time.perf_counter()
+    if concurrency == 1:
+        results = [run_rounds(make_client(), rounds, emails, password, endpoints, seed)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [
+                pool.submit(run_rounds, make_client(), share, emails, password, endpoints,
+                            None if seed is None else seed + n)
+                for n, share in enumerate(shares) if share
+            ]
+            results = [future.result() for future in futures]
+    wall_time = time.perf_counter() - started
+
+    merged = defaultdict(list)
+    for samples in results:
+        for name, values in samples.items():
+            merged[name].extend(values)
+
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'target': base_url or 'in-process',
+        'rounds': rounds,
+        'concurrency': concurrency,
+        'wall_time_s': round(wall_time, 3),
+        'endpoints': {name: summarize(merged[name], wall_time) for name in endpoints if merged[name]},
+        'total': summarize([value for values in merged.values() for value in values], wall_time),
+    }
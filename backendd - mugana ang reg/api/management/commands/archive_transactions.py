@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from api import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move transactions older than TRANSACTION_ARCHIVE_AFTER_MONTHS whole months into the compressed "
+        "archive. Reports and exports still include them; the transaction list no longer does."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=settings.TRANSACTION_ARCHIVE_AFTER_MONTHS,
+                            help="Whole months before the current one to keep in the hot table.")
+        parser.add_argument('--user', action='append', default=[], help="Email of a user to process (repeatable). Defaults to all users.")
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError("--months must be at least 1")
+
+        user_ids = None
+        if options['user']:
+            users = dict(CustomUser.objects.filter(email__in=options['user']).values_list('email', 'id'))
+            missing = set(options['user']) - set(users)
+            if missing:
+                raise CommandError(f"Unknown user(s): {', '.join(sorted(missing))}")
+            user_ids = list(users.values())
+
+        before = archive.horizon(months=options['months'])
+        moved = archive.archive(before, user_ids)
+        emails = dict(CustomUser.objects.filter(id__in=moved).values_list('id', 'email'))
+        for user_id, count in sorted(moved.items()):
+            self.stdout.write(f"{emails[user_id]}: {count} transaction(s)")
+        self.stdout.write(self.style.SUCCESS(f"Archived {sum(moved.values())} transaction(s) dated before {before}."))
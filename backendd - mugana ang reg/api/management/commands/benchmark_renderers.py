@@ -0,0 +1,81 @@
+import json
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api import renderers
+
+
+def sample_payloads(rows):
+    """Shaped like the transaction list (fast serializer output) and a report."""
+    now = timezone.now()
+    transactions = {
+        'next': None,
+        'results': [
+            {
+                'id': n,
+                'amount': f'{Decimal(n % 5000) / 4:.2f}',
+                'type': 'expense' if n % 10 else 'income',
+                'category': ('food', 'shopping', 'utilities', 'salary')[n % 4],
+                'description': f'Purchase #{n} at Café Señor',
+                'date': (date(2025, 1, 1) + timedelta(days=n % 365)).isoformat(),
+                'created_at': now.isoformat(),
+            }
+            for n in range(rows)
+        ],
+    }
+    report = [
+        {'month': date(2024, 1, 1) + timedelta(days=31 * (n % 24)), 'type': 'expense',
+         'total': Decimal(n * 7) / 4, 'created': now}
+        for n in range(rows)
+    ]
+    return {'transactions': transactions, 'report': report}
+
+
+class Command(BaseCommand):
+    help = "Compare DRF's JSONRenderer with the orjson and MessagePack renderers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help="Rows per payload.")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        candidates = {'drf-json': JSONRenderer()}
+        if renderers.orjson:
+            candidates['orjson'] = renderers.ORJSONRenderer()
+        if renderers.msgpack:
+            candidates['msgpack'] = renderers.MessagePackRenderer()
+
+        results = {}
+        for name, payload in sample_payloads(options['rows']).items():
+            baseline = JSONRenderer().render(payload)
+            results[name] = {}
+            for renderer_name, renderer in candidates.items():
+                started = time.perf_counter()
+                for _ in range(options['iterations']):
+                    body = renderer.render(payload)
+                elapsed = (time.perf_counter() - started) / options['iterations']
+                results[name][renderer_name] = {
+                    'ms': round(elapsed * 1000, 3),
+                    'bytes': len(body),
+                    'identical_json': body == baseline if renderer.media_type == 'application/json' else None,
+                }
+            base_ms = results[name]['drf-json']['ms']
+            for stats in results[name].values():
+                stats['speedup'] = round(base_ms / stats['ms'], 2) if stats['ms'] else None
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, by_renderer in results.items():
+            self.stdout.write(f"{name} ({options['rows']} rows)")
+            for renderer_name, stats in by_renderer.items():
+                identical = '' if stats['identical_json'] is None else f" identical={stats['identical_json']}"
+                self.stdout.write(
+                    f"  {renderer_name:9} {stats['ms']:9.3f} ms  {stats['bytes']:9} bytes  x{stats['speedup']}{identical}"
+                )
@@ -0,0 +1,58 @@
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly api_transaction partitions ahead of time and optionally detach old ones "
+        "(Postgres, after migration api 0013). Run it daily or weekly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=settings.TRANSACTION_PARTITIONS_AHEAD,
+                            help="Months after the current one that must have a partition.")
+        parser.add_argument('--detach-before', metavar='YYYY-MM',
+                            help="Archive the transactions of months before this one (see archive_transactions) "
+                                 "and detach their emptied partitions. The tables are kept for dropping.")
+        parser.add_argument('--list', action='store_true', help="Only list the attached partitions.")
+
+    def handle(self, *args, **options):
+        if not partitions.is_partitioned(connection):
+            self.stdout.write(f"{partitions.TABLE} is not partitioned on this database; nothing to do.")
+            return
+
+        if options['list']:
+            for name, start, end in partitions.partitions(connection):
+                self.stdout.write(f"{name} {start} .. {end}")
+            return
+
+        this_month = date.today().replace(day=1)
+        created = partitions.ensure_partitions(
+            connection, this_month, this_month + relativedelta(months=options['ahead'])
+        )
+        for name in created:
+            self.stdout.write(f"Created {name}")
+
+        before = options['detach_before']
+        if before is None and settings.TRANSACTION_PARTITION_RETENTION_MONTHS is not None:
+            before = this_month - relativedelta(months=settings.TRANSACTION_PARTITION_RETENTION_MONTHS)
+        elif before is not None:
+            try:
+                before = date.fromisoformat(f'{before}-01')
+            except ValueError:
+                raise CommandError("--detach-before must look like YYYY-MM")
+        if before is not None:
+            detached = partitions.detach_partitions(connection, before)
+            for name in detached:
+                self.stdout.write(f"Detached {name}")
+            remaining = [name for name, _, end in partitions.partitions(connection) if end <= before]
+            if remaining:
+                self.stderr.write(f"Kept {remaining[0]}: it gained rows after archiving; run again to detach it.")
+
+        self.stdout.write(self.style.SUCCESS(f"Partitions are in place through {this_month + relativedelta(months=options['ahead']):%Y-%m}."))
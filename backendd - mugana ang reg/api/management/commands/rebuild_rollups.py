@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from api import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild or reconcile the monthly transaction rollups from the raw transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', default=[], help="Email of a user to process (repeatable). Defaults to all users.")
+        parser.add_argument('--check', action='store_true', help="Only report buckets that have drifted; exit non-zero if any did.")
+        parser.add_argument('--fix', action='store_true', help="With --check, rebuild only the users that have drifted.")
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.order_by('id')
+        if options['user']:
+            users = users.filter(email__in=options['user'])
+            missing = set(options['user']) - set(users.values_list('email', flat=True))
+            if missing:
+                raise CommandError(f"Unknown user(s): {', '.join(sorted(missing))}")
+
+        drifted = 0
+        for user_id, email in users.values_list('id', 'email').iterator():
+            if not options['check']:
+                rollups.rebuild(user_id)
+                continue
+
+            diff = rollups.reconcile(user_id)
+            if not diff:
+                continue
+            drifted += 1
+            for (month, type, category), (stored, expected) in sorted(diff.items()):
+                self.stdout.write(f"{email} {month:%Y-%m} {type}/{category}: stored={stored} expected={expected}")
+            if options['fix']:
+                rollups.rebuild(user_id)
+
+        if options['check'] and drifted and not options['fix']:
+            raise CommandError(f"{drifted} user(s) have drifted rollups")
+        self.stdout.write(self.style.SUCCESS("Rollups are up to date."))
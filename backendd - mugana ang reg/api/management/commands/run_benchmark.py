@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from api import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the API endpoints with concurrent virtual users and write latency "
+        "percentiles, throughput and queries per request to a JSON file. "
+        "Log in as accounts created by seed_load_data; transactions_create adds rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=100, help="Total rounds; each round calls every selected endpoint once.")
+        parser.add_argument('--concurrency', type=int, default=1, help="Number of virtual users running rounds in parallel.")
+        parser.add_argument('--endpoint', action='append', default=[], choices=list(loadtest.ENDPOINTS),
+                            help="Endpoint to measure (repeatable). Defaults to all.")
+        parser.add_argument('--base-url', default=None,
+                            help="Benchmark a running server instead of calling the app in-process (no query counts).")
+        parser.add_argument('--host', default='localhost', help="Host header for in-process requests.")
+        parser.add_argument('--accounts', type=int, default=1000, help="Pick virtual users from this many generated accounts.")
+        parser.add_argument('--password', default=loadtest.DEFAULT_PASSWORD, help="Password of the generated accounts.")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed for account choice and payloads.")
+        parser.add_argument('--output', default='benchmark.json', help="Where to write the JSON report ('-' for stdout).")
+
+    def handle(self, *args, **options):
+        if options['rounds'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--rounds and --concurrency must be at least 1")
+
+        emails = list(
+            CustomUser.objects.filter(email__endswith=f"@{loadtest.EMAIL_DOMAIN}", is_active=True)
+            .order_by('id').values_list('email', flat=True)[:options['accounts']]
+        )
+        try:
+            report = loadtest.run_benchmark(
+                options['rounds'], concurrency=options['concurrency'], endpoints=options['endpoint'],
+                emails=emails, password=options['password'], base_url=options['base_url'],
+                host=options['host'], seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = json.dumps(report, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(output)
+            return
+        with open(options['output'], 'w') as f:
+            f.write(output + '\n')
+
+        for name, stats in report['endpoints'].items():
+            latency = stats['latency_ms']
+            self.stdout.write(
+                f"{name:20} p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms "
+                f"errors={stats['errors']} queries={stats['queries_per_request']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
@@ -0,0 +1,42 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api import jobs
+
+
+def run_worker(once, poll_interval):
+    # Each process opens its own database connections
+    connections.close_all()
+    jobs.work(once=once, poll_interval=poll_interval)
+
+
+class Command(BaseCommand):
+    help = "Run background jobs (exports, rollup rebuilds) from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help="Number of worker processes.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+        parser.add_argument('--poll-interval', type=float, default=None, help="Seconds to sleep when the queue is empty.")
+
+    def handle(self, *args, **options):
+        if options['workers'] <= 1:
+            jobs.work(once=options['once'], poll_interval=options['poll_interval'])
+            return
+
+        # Don't let children inherit the parent's open connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=run_worker, args=(options['once'], options['poll_interval']), daemon=True)
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} job workers.")
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
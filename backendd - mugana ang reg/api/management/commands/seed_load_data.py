@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from api import loadtest
+
+
+class Command(BaseCommand):
+    help = "Bulk-insert synthetic users, transactions and budgets for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help="Number of users to create.")
+        parser.add_argument('--transactions', type=int, default=500, help="Transactions per user.")
+        parser.add_argument('--budgets', type=int, default=12, help="Budgets per user.")
+        parser.add_argument('--months', type=int, default=12, help="Spread transactions over this many past months.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT and per commit.")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed, for reproducible data.")
+        parser.add_argument('--password', default=loadtest.DEFAULT_PASSWORD, help="Password shared by every generated user.")
+        parser.add_argument('--clear', action='store_true', help=f"First delete every user under @{loadtest.EMAIL_DOMAIN}.")
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['transactions'], options['budgets']) < 0 or options['months'] < 1:
+            raise CommandError("Counts must not be negative and --months must be at least 1")
+
+        if options['clear']:
+            deleted, _ = CustomUser.objects.filter(email__endswith=f"@{loadtest.EMAIL_DOMAIN}").delete()
+            self.stdout.write(f"Deleted {deleted} rows.")
+
+        def progress(created):
+            self.stdout.write(f"  {created['users']}/{options['users']} users, {created['transactions']} transactions")
+
+        created = loadtest.generate(
+            options['users'], options['transactions'], options['budgets'],
+            months=options['months'], seed=options['seed'], password=options['password'],
+            batch_size=options['batch_size'], progress=progress if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created['users']} users, {created['transactions']} transactions, "
+            f"{created['budgets']} budgets and {created['rollups']} rollup buckets."
+        ))
@@ -0,0 +1,221 @@
+"""
+Prometheus metrics for the request middleware, served at /metrics.
+
+Histograms are recorded in process memory. With several workers behind one
+port a scrape reaches whichever worker accepts it, so METRICS_DIR must then
+name a directory shared by all of them: each worker writes its cumulative
+series there (at most every METRICS_FLUSH_INTERVAL seconds) and /metrics
+sums every worker's file. Without METRICS_DIR the figures are those of the
+answering process only, which is correct for a single worker alone.
+"""
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import cache
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+def format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class Histogram:
+    """
+    Cumulative Prometheus histogram keyed by label values. Observing is a
+    bisect plus a few additions under a lock, cheap enough for every request.
+    """
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """[(labels, bucket counts, sum, count)] of every series."""
+        with self.lock:
+            return [(labels, list(counts), total, count) for labels, (counts, total, count) in self.series.items()]
+
+    def render(self, snapshot=None):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        if snapshot is None:
+            snapshot = self.snapshot()
+        for labels, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = format_labels(self.labelnames, labels, [('le', format_bound(bound))])
+                yield f'{self.name}_bucket{le} {cumulative}'
+            yield f'{self.name}_sum{format_labels(self.labelnames, labels)} {total}'
+            yield f'{self.name}_count{format_labels(self.labelnames, labels)} {count}'
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent handling the request.', LATENCY_BUCKETS, ('view', 'method', 'status')
+)
+DB_QUERIES = Histogram('db_queries_per_request', 'SQL queries issued per request.', QUERY_BUCKETS, ('view',))
+DB_TIME = Histogram('db_time_seconds', 'Time spent in SQL per request.', LATENCY_BUCKETS, ('view',))
+RENDER_TIME = Histogram('render_time_seconds', 'Time spent rendering the response body.', LATENCY_BUCKETS, ('view',))
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Size of non-streaming response bodies.', SIZE_BUCKETS, ('view',))
+
+HISTOGRAMS = [REQUEST_LATENCY, DB_QUERIES, DB_TIME, RENDER_TIME, RESPONSE_SIZE]
+
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+_process = None  # (pid, file name) of this worker under METRICS_DIR
+
+
+def observe(view, method, status, duration, queries, db_time, render_time, size):
+    REQUEST_LATENCY.observe((view, method, str(status)), duration)
+    DB_QUERIES.observe((view,), queries)
+    DB_TIME.observe((view,), db_time)
+    if render_time is not None:
+        RENDER_TIME.observe((view,), render_time)
+    if size is not None:
+        RESPONSE_SIZE.observe((view,), size)
+    flush()
+
+
+def process_state():
+    report_cache = cache.stats()
+    return {
+        'histograms': {histogram.name: histogram.snapshot() for histogram in HISTOGRAMS},
+        'report_cache': {outcome: report_cache[outcome] for outcome in ('hits', 'misses')},
+    }
+
+
+def process_file(directory):
+    global _process
+    # Named per process start, not just pid: a restarted worker reusing a
+    # pid must not overwrite the counts of the one before it
+    if _process is None or _process[0] != os.getpid():
+        _process = (os.getpid(), f'{os.getpid()}-{uuid.uuid4().hex[:12]}.json')
+    return os.path.join(directory, _process[1])
+
+
+def flush(force=False):
+    """Write this worker's cumulative figures to METRICS_DIR, at most every METRICS_FLUSH_INTERVAL seconds."""
+    global _last_flush
+    directory = settings.METRICS_DIR
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+        return
+    if not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        _last_flush = now
+        path = process_file(directory)
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as f:
+            json.dump(process_state(), f)
+        # Readers only ever see whole files
+        os.replace(temporary, path)
+    finally:
+        _flush_lock.release()
+
+
+def collect():
+    """Figures to export: this process's, or with METRICS_DIR every worker's summed."""
+    if not settings.METRICS_DIR:
+        return process_state()
+    flush(force=True)
+    histograms = {histogram.name: {} for histogram in HISTOGRAMS}
+    report_cache = {'hits': 0, 'misses': 0}
+    for name in sorted(os.listdir(settings.METRICS_DIR)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, name)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for outcome in report_cache:
+            report_cache[outcome] += state['report_cache'][outcome]
+        for histogram_name, series in state['histograms'].items():
+            merged = histograms.get(histogram_name)
+            if merged is None:
+                continue
+            for labels, counts, total, count in series:
+                labels = tuple(labels)
+                if labels not in merged:
+                    merged[labels] = [[0] * len(counts), 0.0, 0]
+                merged[labels][0] = [a + b for a, b in zip(merged[labels][0], counts)]
+                merged[labels][1] += total
+                merged[labels][2] += count
+    return {
+        'histograms': {
+            name: [(labels, counts, total, count) for labels, (counts, total, count) in series.items()]
+            for name, series in histograms.items()
+        },
+        'report_cache': report_cache,
+    }
+
+
+def render():
+    state = collect()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render([
+            (tuple(labels), counts, total, count) for labels, counts, total, count in state['histograms'][histogram.name]
+        ]))
+    for outcome in ('hits', 'misses'):
+        lines.append(f'# TYPE report_cache_{outcome}_total counter')
+        lines.append(f'report_cache_{outcome}_total {state["report_cache"][outcome]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. With several workers, set METRICS_DIR so the
+    figures cover all of them (see the module docstring).
+    Requires METRICS_TOKEN; without one it is only served when DEBUG is on.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden("Set METRICS_TOKEN to enable /metrics")
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,236 @@
+import gzip
+import time
+import zlib
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from . import metrics, profiling, routers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+class QueryTimer:
+    """execute_wrapper hook counting queries and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    Time every request that resolves to a named URL and report latency, SQL
+    query count and time, render time and body size, both per response in a
+    Server-Timing header and in the histograms served at /metrics.
+
+    Should sit first in MIDDLEWARE so the latency covers the whole stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None or not match.url_name or match.url_name == 'metrics':
+            return response
+
+        render_time = getattr(request, '_metrics_render_time', None)
+        size = None if response.streaming else len(response.content)
+        metrics.observe(
+            match.view_name, request.method, response.status_code,
+            duration, timer.count, timer.elapsed, render_time, size
+        )
+
+        timings = [
+            f'app;dur={duration * 1000:.1f}',
+            f'db;dur={timer.elapsed * 1000:.1f};desc="{timer.count} queries"',
+        ]
+        if render_time is not None:
+            timings.append(f'render;dur={render_time * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # Runs last of all template-response hooks, right before Django
+        # renders the body (for DRF, the renderer serializing response.data)
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_render_time = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request when a staff user asks for it with an `X-Profile: 1`
+    header or `?profile=1`, or at random for PROFILING_SAMPLE_RATE of the
+    requests to PROFILING_SAMPLE_VIEWS. The profile id comes back in the
+    X-Profile-Id response header; see /api/profiles/.
+
+    Sits last in MIDDLEWARE so the profile covers the view and rendering.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        requested_by = profiling.staff_user(request) if profiling.requested(request) else None
+        if requested_by is None and not profiling.sampled(request):
+            return self.get_response(request)
+        return profiling.profile_request(request, self.get_response, requested_by)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe requests to REPLICA_VIEWS read the ledger tables from a read
+    replica (see api.routers.ReplicaRouter). Does nothing without
+    DATABASE_REPLICAS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            token = getattr(request, '_replica_token', None)
+            if token is not None:
+                routers.end_replica_reads(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if settings.DATABASE_REPLICAS and request.method in ('GET', 'HEAD') \
+                and request.resolver_match.url_name in settings.REPLICA_VIEWS:
+            request._replica_token = routers.allow_replica_reads(request)
+        return None
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            accepted[coding.lower()] = q
+    return accepted
+
+
+def gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+    for chunk in chunks:
+        # Sync-flush per chunk so the client receives rows as they are produced
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli (when installed) or gzip, whichever the
+    client prefers, including streaming exports chunk by chunk.
+
+    Bodies under COMPRESSION_MIN_SIZE and media types that are already
+    compressed are passed through. Levels come from COMPRESSION_LEVELS by URL
+    name (falling back to the 'default' entry), so cheap-to-produce, large
+    responses can use a faster level than small JSON; a level of None
+    disables that encoding for the endpoint.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding') or response.status_code in (204, 206, 304):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type.startswith(settings.COMPRESSION_SKIP_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding, level = self.choose(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                # Async streams are left alone; the API only streams synchronously
+                return response
+            stream = brotli_stream if encoding == 'br' else gzip_stream
+            response.streaming_content = stream(response.streaming_content, level)
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=level)
+            else:
+                compressed = gzip.compress(response.content, compresslevel=level, mtime=0)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong validator becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def choose(self, request):
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        match = getattr(request, 'resolver_match', None)
+        levels = settings.COMPRESSION_LEVELS.get(match.url_name if match else None) or settings.COMPRESSION_LEVELS['default']
+
+        best, best_q = None, 0.0
+        # Listed in server preference order; a tie on q keeps the earlier one
+        for encoding in ('br', 'gzip'):
+            if encoding == 'br' and brotli is None:
+                continue
+            q = accepted.get(encoding, accepted.get('*', 0.0))
+            if levels.get(encoding) is not None and q > best_q:
+                best, best_q = encoding, q
+        return best, levels.get(best)
@@ -0,0 +1,72 @@
+from django.db import migrations
+
+# Postgres: a generated tsvector column, so every write path (ORM, bulk,
+# raw SQL) keeps it in sync without application code
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE api_transaction ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, '') || ' ' || category)) STORED
+    """,
+    "CREATE INDEX api_txn_search_idx ON api_transaction USING GIN (search_vector)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS api_txn_search_idx",
+    "ALTER TABLE api_transaction DROP COLUMN IF EXISTS search_vector",
+]
+
+# SQLite: an external-content FTS5 index maintained by triggers. SQLite
+# table rebuilds in later schema migrations drop the triggers; a post_migrate
+# handler (api.search.ensure_sqlite_index) recreates them.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE api_transaction_fts USING fts5(
+        description, category, content='api_transaction', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER api_transaction_fts_ai AFTER INSERT ON api_transaction BEGIN
+        INSERT INTO api_transaction_fts(rowid, description, category) VALUES (new.id, new.description, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER api_transaction_fts_ad AFTER DELETE ON api_transaction BEGIN
+        INSERT INTO api_transaction_fts(api_transaction_fts, rowid, description, category)
+        VALUES ('delete', old.id, old.description, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER api_transaction_fts_au AFTER UPDATE OF description, category ON api_transaction BEGIN
+        INSERT INTO api_transaction_fts(api_transaction_fts, rowid, description, category)
+        VALUES ('delete', old.id, old.description, old.category);
+        INSERT INTO api_transaction_fts(rowid, description, category) VALUES (new.id, new.description, new.category);
+    END
+    """,
+    "INSERT INTO api_transaction_fts(api_transaction_fts) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS api_transaction_fts_ai",
+    "DROP TRIGGER IF EXISTS api_transaction_fts_ad",
+    "DROP TRIGGER IF EXISTS api_transaction_fts_au",
+    "DROP TABLE IF EXISTS api_transaction_fts",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_requestprofile'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,115 @@
+import re
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.db import migrations
+
+# Postgres only: rebuild api_transaction as a table range-partitioned by
+# month on `date` (see api/partitions.py and `manage.py manage_partitions`).
+# The copy runs in the migration's transaction and locks the table, so run
+# it in a maintenance window on large databases. Other backends keep the
+# plain table.
+
+TABLE = 'api_transaction'
+OLD = 'api_transaction_unpartitioned'
+MONTHS_AHEAD = 3
+# Older rows (including mistyped dates) go to the default partition rather
+# than creating thousands of nearly empty ones
+MAX_MONTHS_BACK = 120
+
+
+def fetch(cursor, sql, params=()):
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+def rebuild(schema_editor, partitioned):
+    connection = schema_editor.connection
+    execute = schema_editor.execute
+
+    with connection.cursor() as cursor:
+        execute(f'ALTER TABLE {TABLE} RENAME TO {OLD}')
+        # Constraints and indexes to recreate under their original names once
+        # the old table (which still holds those names) is gone
+        primary_key, = fetch(cursor, "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [OLD])[0]
+        foreign_keys = fetch(
+            cursor, "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [OLD]
+        )
+        indexes = [definition for definition, in fetch(
+            cursor,
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary",
+            [OLD]
+        )]
+        columns = ', '.join(column for column, in fetch(
+            cursor,
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = %s AND is_generated = 'NEVER' AND table_schema = current_schema() ORDER BY ordinal_position",
+            [OLD]
+        ))
+        # Databases created before Django 4.1 have a serial `id` whose
+        # sequence belongs to the old table rather than an identity column
+        sequence, identity = fetch(
+            cursor,
+            "SELECT pg_get_serial_sequence(%s, 'id'), is_identity FROM information_schema.columns "
+            "WHERE table_name = %s AND column_name = 'id' AND table_schema = current_schema()",
+            [OLD, OLD]
+        )[0]
+        first, = fetch(cursor, f'SELECT min(date) FROM {OLD}')[0]
+
+        like = f'LIKE {OLD} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING GENERATED'
+        if partitioned:
+            execute(f'CREATE TABLE {TABLE} ({like}) PARTITION BY RANGE (date)')
+            execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+            this_month = date.today().replace(day=1)
+            month = max(
+                (first or this_month).replace(day=1),
+                this_month - relativedelta(months=MAX_MONTHS_BACK)
+            )
+            while month <= this_month + relativedelta(months=MONTHS_AHEAD):
+                execute(
+                    f'CREATE TABLE {TABLE}_p{month:%Y_%m} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)',
+                    [month, month + relativedelta(months=1)]
+                )
+                month += relativedelta(months=1)
+        else:
+            execute(f'CREATE TABLE {TABLE} ({like})')
+
+        if identity != 'YES':
+            execute(f'ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id')
+        execute(f'INSERT INTO {TABLE} ({columns}) SELECT {columns} FROM {OLD}')
+        execute(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), coalesce(max(id), 0) + 1, false) FROM {TABLE}"
+        )
+        # Partitions go with their parent; detached ones are not copied back
+        execute(f'DROP TABLE {OLD} CASCADE')
+
+        # A partitioned table's primary key must include the partition key.
+        # `id` still comes from the identity sequence, so it stays unique and
+        # the ORM keeps using it as the primary key.
+        execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {primary_key} PRIMARY KEY {"(id, date)" if partitioned else "(id)"}')
+        for name, definition in foreign_keys:
+            execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+        for definition in indexes:
+            execute(re.sub(rf'\bON (ONLY )?(\S+\.)?{OLD}\b', f'ON {TABLE}', definition))
+        execute(f'ANALYZE {TABLE}')
+
+
+def partition(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        rebuild(schema_editor, partitioned=True)
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        rebuild(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_transaction_amount_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
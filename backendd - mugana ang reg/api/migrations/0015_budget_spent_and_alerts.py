@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:17
+
+import json
+import zlib
+from datetime import date, timedelta
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_spent(apps, schema_editor):
+    # Counts existing expenses once; later writes keep `spent` up to date
+    # (api.budgets). No alerts are raised for spending that already happened.
+    Budget = apps.get_model('api', 'Budget')
+    Transaction = apps.get_model('api', 'Transaction')
+    TransactionArchive = apps.get_model('api', 'TransactionArchive')
+    expenses = Transaction.objects.filter(
+        user=models.OuterRef('user'),
+        type='expense',
+        category=models.OuterRef('category'),
+        date__gte=models.OuterRef('start_date'),
+        date__lte=models.OuterRef('end_date')
+    ).order_by().values('user').annotate(total=models.Sum('amount')).values('total')
+    Budget.objects.update(spent=Coalesce(
+        models.Subquery(expenses, output_field=models.DecimalField(max_digits=14, decimal_places=2)),
+        models.Value(Decimal('0')),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2)
+    ))
+
+    # Archived expenses (see api.archive for the payload format)
+    for chunk in TransactionArchive.objects.filter(totals__has_key='expense').iterator():
+        budgets = Budget.objects.filter(
+            user_id=chunk.user_id, start_date__lte=chunk.month + timedelta(days=31), end_date__gte=chunk.month
+        ).values_list('id', 'category', 'start_date', 'end_date')
+        if not budgets:
+            continue
+        columns = json.loads(zlib.decompress(chunk.payload))
+        expenses = [
+            (category, date.fromisoformat(on), Decimal(amount))
+            for type, category, on, amount in zip(columns['type'], columns['category'], columns['date'], columns['amount'])
+            if type == 'expense'
+        ]
+        for budget_id, category, start_date, end_date in budgets:
+            delta = sum(
+                (amount for spent_in, on, amount in expenses if spent_in == category and start_date <= on <= end_date),
+                Decimal('0')
+            )
+            if delta:
+                Budget.objects.filter(pk=budget_id).update(spent=models.F('spent') + delta)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_transactionarchive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='spent',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14),
+        ),
+        migrations.CreateModel(
+            name='BudgetAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('threshold', models.PositiveSmallIntegerField()),
+                ('spent', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='api.budget')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budget_alerts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='api_budget_alert_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('budget', 'threshold'), name='api_budget_alert_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_spent, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fail_duplicates(apps, schema_editor):
+    # Concurrent requests could queue the same job twice before the
+    # constraint existed; keep the oldest active copy of each
+    Job = apps.get_model('api', 'Job')
+    seen = set()
+    for job in Job.objects.filter(status__in=['pending', 'running']).order_by('created_at'):
+        if job.dedupe_key in seen:
+            Job.objects.filter(pk=job.pk).update(status='failed', error='Duplicate of an identical queued job')
+        seen.add(job.dedupe_key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_budget_spent_and_alerts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('dedupe_key',), name='api_job_active_uniq'),
+        ),
+    ]
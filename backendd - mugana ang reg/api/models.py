@@ -1,6 +1,9 @@
 from django.db import models
 
 # Create your models here.
+import uuid
+from decimal import Decimal
+
 from django.db import models
 from accounts.models import CustomUser
 
@@ -27,6 +30,19 @@ class Transaction(models.Model):
         ('other', 'Other')
     ]
 
+    @classmethod
+    def category_error(cls, type, category):
+        """
+        Message if `category` belongs only to the other transaction type,
+        else None. Categories listed for both types (e.g. 'other') are valid
+        for either.
+        """
+        if type == 'expense' and category in dict(cls.INCOME_CATEGORIES) and category not in dict(cls.EXPENSE_CATEGORIES):
+            return "Invalid category for expense type"
+        elif type == 'income' and category in dict(cls.EXPENSE_CATEGORIES) and category not in dict(cls.INCOME_CATEGORIES):
+            return "Invalid category for income type"
+        return None
+
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='transactions')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
@@ -38,6 +54,19 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Matches the keyset ordering used to page through a user's ledger;
+            # also serves plain (user, date range) filters
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='api_txn_user_date_idx'),
+            # Per-type date ranges: partial months of spending/income reports
+            models.Index(fields=['user', 'type', 'date'], name='api_txn_user_type_date_idx'),
+            # Per-category date ranges: budget spend
+            models.Index(fields=['user', 'category', 'date'], name='api_txn_user_cat_date_idx'),
+            # Keyset ordering of the list by amount (either direction)
+            models.Index(fields=['user', 'amount', 'id'], name='api_txn_user_amount_idx'),
+        ]
+
+
 class Budget(models.Model):
     CATEGORY_CHOICES = [
         ('housing', 'Housing'),
@@ -64,8 +93,141 @@ class Budget(models.Model):
     period = models.CharField(max_length=10, choices=PERIOD_CHOICES, default='monthly')
     start_date = models.DateField()
     end_date = models.DateField()
+    # Expenses in `category` between start_date and end_date (archived ones
+    # included), kept in step by api.budgets: deltas on every transaction
+    # write, a full recompute when the budget itself is saved
+    spent = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-start_date']
\ No newline at end of file
+        ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['user', '-start_date'], name='api_budget_user_start_idx'),
+        ]
+
+class BudgetAlert(models.Model):
+    # Recorded when a write takes a budget's spend to one of
+    # BUDGET_ALERT_THRESHOLDS percent of its amount (api.budgets)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='budget_alerts')
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='alerts')
+    threshold = models.PositiveSmallIntegerField()  # Percent of the budget amount
+    spent = models.DecimalField(max_digits=14, decimal_places=2)  # When the threshold was crossed
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['budget', 'threshold'], name='api_budget_alert_uniq')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='api_budget_alert_user_idx'),
+        ]
+
+
+class MonthlyRollup(models.Model):
+    # Per-month sums of a user's transactions, kept in step with every write
+    # through api.ledger so reports never have to rescan the raw rows.
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='monthly_rollups')
+    month = models.DateField()  # First day of the month
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    category = models.CharField(max_length=20)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['month', 'type', 'category']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'type', 'category'], name='api_rollup_bucket_uniq')
+        ]
+
+
+class DataStamp(models.Model):
+    # Bumped in the same transaction as every write to a user's transactions
+    # or budgets (api.stamps), so conditional GETs validate with one primary
+    # key lookup instead of aggregating the ledger.
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='data_stamp')
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField()
+
+
+class TransactionArchive(models.Model):
+    # Cold storage: one user's transactions for one month, moved out of the
+    # hot table by `manage.py archive_transactions` (api.archive). Rollups
+    # keep counting them, so whole-month reports are unaffected.
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='transaction_archives')
+    month = models.DateField()  # First day of the month
+    count = models.PositiveIntegerField(default=0)
+    totals = models.JSONField(default=dict)  # {type: {category: [total, count]}}, totals as strings
+    payload = models.BinaryField()  # zlib-compressed columnar JSON of the rows
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['user', 'month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='api_archive_month_uniq')
+        ]
+
+
+class Job(models.Model):
+    # Background work (exports, rebuilds) picked up by the run_jobs worker
+    KIND_CHOICES = [
+        ('report_csv', 'Report CSV'),
+        ('report_pdf', 'Report PDF'),
+        ('ledger_csv', 'Ledger CSV'),
+        ('rebuild_rollups', 'Rebuild rollups')
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    dedupe_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    result = models.FileField(upload_to='exports/', null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='api_job_queue_idx'),
+        ]
+        constraints = [
+            # At most one queued or running copy of a request (see jobs.enqueue)
+            models.UniqueConstraint(
+                fields=['dedupe_key'], condition=models.Q(status__in=['pending', 'running']), name='api_job_active_uniq'
+            ),
+        ]
+
+
+class RequestProfile(models.Model):
+    # cProfile + tracemalloc capture of one request, taken on demand by staff
+    # or by sampling (api.profiling)
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    view_name = models.CharField(max_length=100, blank=True)
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    stats = models.FileField(upload_to='profiles/')
+    summary = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
@@ -0,0 +1,130 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique multi-column ordering.
+
+    Each page is fetched with a WHERE clause on the last row of the previous
+    page instead of an OFFSET, so with an index matching `ordering` every
+    page costs the same however deep the client scrolls. The cursor is an
+    opaque token carrying the ordering and the position values.
+    """
+    ordering = None
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None, ordering=None):
+        self.request = request
+        self.ordering = tuple(ordering or self.ordering)
+        self.page_size = self.get_page_size(request)
+        self.next_position = None
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            last = rows[-1]
+            self.next_position = [
+                last[name] if isinstance(last, dict) else getattr(last, name)
+                for name in self.field_names
+            ]
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return type(self).page_size
+        if page_size <= 0:
+            return type(self).page_size
+        return min(page_size, self.max_page_size)
+
+    @property
+    def field_names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def after(self, position):
+        """
+        Rows strictly after `position` in the ordering, expanded as
+        (a < x) OR (a = x AND b < y) OR ... plus a redundant bound on the
+        leading column so the planner can range-scan the index.
+        """
+        names = self.field_names
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            prefix = {names[j]: position[j] for j in range(i)}
+            condition |= Q(**prefix, **{f'{names[i]}__{lookup}': position[i]})
+        leading = 'lte' if self.ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{names[0]}__{leading}': position[0]}) & condition
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    def encode_cursor(self, position):
+        payload = {
+            'o': list(self.ordering),
+            'p': [value.isoformat() if isinstance(value, (date, datetime)) else
+                  str(value) if isinstance(value, Decimal) else value
+                  for value in position]
+        }
+        token = urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode())
+        return token.decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            if payload['o'] != list(self.ordering) or len(payload['p']) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.field_names, payload['p'])
+            ]
+        except (KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class TransactionPagination(KeysetPagination):
+    ordering = ('-date', '-created_at', '-id')
+
+    # ?ordering= values and the unique keyset each one pages over; every
+    # one is served by a (user, ...) index in either direction
+    orderings = {
+        '-date': ('-date', '-created_at', '-id'),
+        'date': ('date', 'created_at', 'id'),
+        '-amount': ('-amount', '-id'),
+        'amount': ('amount', 'id'),
+    }
@@ -0,0 +1,124 @@
+"""
+Monthly range partitions of api_transaction by `date` on Postgres (set up by
+migration 0013). Each month lives in api_transaction_pYYYY_MM; dates outside
+every partition land in api_transaction_default. Date-bounded queries only
+touch the partitions they overlap, and vacuum/index maintenance work one
+month at a time.
+
+Old partitions are only detached once api.archive has emptied them, so
+rollups, budget spend and the archive keep agreeing with the rows the app
+can read.
+
+Other databases keep a plain table and everything here is a no-op.
+"""
+import re
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+
+from . import archive
+from .models import Transaction
+
+TABLE = Transaction._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+BOUND_RE = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(connection):
+    """[(name, first day, first day after)] of the attached monthly partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+            [TABLE]
+        )
+        rows = cursor.fetchall()
+    bounded = []
+    for name, bound in rows:
+        match = BOUND_RE.search(bound)
+        if match:
+            bounded.append((name, date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2))))
+    return sorted(bounded, key=lambda partition: partition[1])
+
+
+def create_partition(connection, month):
+    """
+    Attach the partition for `month`. Rows already sitting in the default
+    partition for that month are moved into it, since Postgres refuses to
+    create a partition that would overlap rows in the default.
+    """
+    name, start, end = partition_name(month), month, month + relativedelta(months=1)
+    columns = ', '.join(field.column for field in Transaction._meta.concrete_fields)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s LIMIT 1', [start, end])
+        if cursor.fetchone() is None:
+            cursor.execute(f'CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)', [start, end])
+            return name
+
+        cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_PARTITION}')
+        cursor.execute(f'CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)', [start, end])
+        cursor.execute(
+            f'INSERT INTO {TABLE} ({columns}) SELECT {columns} FROM {DEFAULT_PARTITION} '
+            f'WHERE date >= %s AND date < %s',
+            [start, end]
+        )
+        cursor.execute(f'DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s', [start, end])
+        cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT')
+    return name
+
+
+def ensure_partitions(connection, start, until):
+    """Create the missing monthly partitions from `start` up to and including `until`'s month."""
+    existing = {partition[1] for partition in partitions(connection)}
+    created = []
+    month = month_start(start)
+    while month <= until:
+        if month not in existing:
+            created.append(create_partition(connection, month))
+        month += relativedelta(months=1)
+    return created
+
+
+def detach_partitions(connection, before):
+    """
+    Archive every transaction dated before `before` (a month start), then
+    detach the monthly partitions that end on or before it. The emptied
+    tables are kept, under the same name, for dropping. A partition that
+    still holds rows (written since the archive pass) stays attached and
+    nothing after it is detached. Returns the detached names.
+    """
+    archive.archive(before)
+    detached = []
+    for name, start, end in partitions(connection):
+        if end > before:
+            break
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            # Detaching locks the partition, so nothing can land in it after the check
+            cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+            cursor.execute(f'SELECT 1 FROM {name} LIMIT 1')
+            if cursor.fetchone() is not None:
+                transaction.set_rollback(True, using=connection.alias)
+                break
+        detached.append(name)
+    return detached
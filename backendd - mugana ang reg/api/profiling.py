@@ -0,0 +1,189 @@
+import cProfile
+import logging
+import marshal
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+
+from .models import RequestProfile
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+logger = logging.getLogger(__name__)
+
+# tracemalloc is process-wide: count the profiled requests using it so the
+# last one out stops it, and only if profiling is what started it
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+
+
+def start_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.PROFILING_TRACEMALLOC_FRAMES)
+            _tracing_started = True
+        _tracing_users += 1
+
+
+def stop_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+def requested(request):
+    return request.headers.get('X-Profile') == '1' or request.GET.get('profile') == '1'
+
+
+def staff_user(request):
+    """
+    The staff user behind the request, if any. The API authenticates in the
+    view, so the JWT is checked here too; only done for flagged requests.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        user = None
+        for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            try:
+                result = authenticator().authenticate(request)
+            except AuthenticationFailed:
+                return None
+            if result:
+                user = result[0]
+                break
+    return user if user is not None and user.is_staff else None
+
+
+def sampled(request):
+    rate = settings.PROFILING_SAMPLE_RATE
+    if not rate or random.random() >= rate:
+        return False
+    try:
+        return resolve(request.path_info).url_name in settings.PROFILING_SAMPLE_VIEWS
+    except Resolver404:
+        return False
+
+
+def function_rows(stats):
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    return [
+        {
+            'function': pstats.func_std_string(func),
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'total_time': round(total_time, 6),
+            'cumulative_time': round(cumulative_time, 6),
+        }
+        for func, (primitive_calls, calls, total_time, cumulative_time, _) in rows
+    ]
+
+
+def allocation_rows(before, after):
+    return [
+        {
+            'location': f'{diff.traceback[0].filename}:{diff.traceback[0].lineno}',
+            'size_diff': diff.size_diff,
+            'count_diff': diff.count_diff,
+        }
+        for diff in after.compare_to(before, 'lineno')[:TOP_ALLOCATIONS]
+    ]
+
+
+def profile_request(request, get_response, requested_by=None):
+    """
+    Run the rest of the stack for this request under cProfile and
+    tracemalloc, store the result as a RequestProfile and tag the response
+    with its id. A failure in the profiling itself is logged and the
+    response goes out untagged.
+
+    tracemalloc is process-wide, so under a threaded server the allocation
+    summary also picks up concurrent requests; the CPU profile is per thread.
+    """
+    try:
+        start_tracing()
+    except Exception:
+        logger.exception("Could not start tracemalloc for %s", request.path)
+        return get_response(request)
+    try:
+        return profiled(request, get_response, requested_by)
+    finally:
+        stop_tracing()
+
+
+def profiled(request, get_response, requested_by):
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profiler = cProfile.Profile()
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active on this thread
+        return get_response(request)
+    except Exception:
+        logger.exception("Could not start profiling %s", request.path)
+        return get_response(request)
+
+    started = time.perf_counter()
+    try:
+        response = get_response(request)
+    finally:
+        profiler.disable()
+    duration = time.perf_counter() - started
+
+    try:
+        record = save_profile(request, response, profiler, before, duration, requested_by)
+    except Exception:
+        logger.exception("Could not save the profile of %s", request.path)
+        return response
+    response['X-Profile-Id'] = str(record.pk)
+    return response
+
+
+def save_profile(request, response, profiler, before, duration, requested_by):
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    stats = pstats.Stats(profiler)
+    user = getattr(request, 'user', None)
+    match = getattr(request, 'resolver_match', None)
+    record = RequestProfile(
+        user=user if user is not None and user.is_authenticated else None,
+        requested_by=requested_by,
+        view_name=match.view_name if match else '',
+        method=request.method,
+        path=request.get_full_path(),
+        status_code=response.status_code,
+        duration_ms=round(duration * 1000, 3),
+        summary={
+            'total_calls': stats.total_calls,
+            'functions': function_rows(stats),
+            'memory_peak_bytes': peak,
+            'allocations': allocation_rows(before, after),
+        },
+    )
+    # Same format as Stats.dump_stats(); open with pstats or snakeviz
+    record.stats.save(f'{record.pk}.prof', ContentFile(marshal.dumps(stats.stats)), save=False)
+    record.save()
+    purge_old()
+    return record
+
+
+def purge_old():
+    """Keep only the newest PROFILING_KEEP profiles."""
+    stale = RequestProfile.objects.values_list('pk', flat=True)[settings.PROFILING_KEEP:]
+    for record in RequestProfile.objects.filter(pk__in=list(stale)):
+        record.stats.delete(save=False)
+        record.delete()
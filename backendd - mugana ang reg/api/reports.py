@@ -0,0 +1,117 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Q, Sum
+from django.utils.dateparse import parse_date
+
+from . import archive
+from .models import MonthlyRollup, Transaction
+
+CENTS = Decimal('0.01')
+
+
+def parse_report_date(value):
+    """Parse an optional YYYY-MM-DD query parameter; raises ValueError if malformed."""
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f"Invalid date: {value}")
+    return parsed
+
+
+def split_months(start_date, end_date):
+    """
+    Split an inclusive date range into whole months (served by the rollups)
+    and at most two partial edges (served by the raw table).
+
+    Returns (whole_months, partial_ranges). whole_months is None when the
+    range has no complete month, otherwise a (first, end) pair where end is
+    exclusive and either bound is None when the range is open on that side.
+    """
+    first_full = None
+    if start_date:
+        first_full = start_date if start_date.day == 1 else start_date.replace(day=1) + relativedelta(months=1)
+    end_full = None
+    if end_date:
+        next_day = end_date + timedelta(days=1)
+        end_full = next_day if next_day.day == 1 else end_date.replace(day=1)
+
+    if first_full and end_full and first_full >= end_full:
+        return None, [(start_date, end_date)]
+
+    partial = []
+    if start_date and start_date < first_full:
+        partial.append((start_date, first_full - timedelta(days=1)))
+    if end_date and end_full <= end_date:
+        partial.append((end_full, end_date))
+    return (first_full, end_full), partial
+
+
+def category_totals(user, type, start_date=None, end_date=None):
+    """
+    Sum a user's transactions of one type per category, ordered by total.
+
+    Whole months come from MonthlyRollup; only the partial months at either
+    end of the range touch the raw transaction table, so the cost scales
+    with the number of months rather than the number of transactions.
+    Archived transactions are still in the rollups; for partial months they
+    are read from the archive.
+    """
+    whole_months, partial = split_months(start_date, end_date)
+    totals = {}
+
+    if whole_months:
+        first_full, end_full = whole_months
+        buckets = MonthlyRollup.objects.filter(user=user, type=type, count__gt=0)
+        if first_full:
+            buckets = buckets.filter(month__gte=first_full)
+        if end_full:
+            buckets = buckets.filter(month__lt=end_full)
+        for row in buckets.values('category').annotate(total=Sum('total')).order_by():
+            totals[row['category']] = row['total']
+
+    if partial:
+        in_range = Q()
+        for low, high in partial:
+            in_range |= Q(date__gte=low, date__lte=high)
+        rows = Transaction.objects.filter(in_range, user=user, type=type).values('category').annotate(
+            total=Sum('amount')
+        ).order_by()
+        for row in rows:
+            totals[row['category']] = totals.get(row['category'], 0) + row['total']
+        # Partial months old enough to have been archived
+        for category, total in archive.category_totals(user, type, partial).items():
+            totals[category] = totals.get(category, 0) + total
+
+    return [
+        {'category': category, 'total': total.quantize(CENTS)}
+        for category, total in sorted(totals.items(), key=lambda item: -item[1])
+    ]
+
+
+def monthly_trends(user):
+    return MonthlyRollup.objects.filter(
+        user=user,
+        count__gt=0
+    ).values('month', 'type').annotate(
+        total=Sum('total')
+    ).order_by('month', 'type')
+
+
+REPORT_FILENAMES = {
+    'spending': 'spending_report',
+    'income': 'income_report',
+    'trends': 'trends_report',
+}
+
+
+def build_report(user, report_type, start_date=None, end_date=None):
+    if report_type == 'spending':
+        return category_totals(user, 'expense', start_date, end_date)
+    elif report_type == 'income':
+        return category_totals(user, 'income', start_date, end_date)
+    elif report_type == 'trends':
+        return monthly_trends(user)
+    raise ValueError('Invalid report type')
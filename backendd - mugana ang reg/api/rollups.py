@@ -0,0 +1,93 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from . import archive, cache
+from .models import MonthlyRollup, Transaction
+
+
+def bucket_key(txn):
+    return (txn.user_id, txn.date.replace(day=1), txn.type, txn.category)
+
+
+def apply_changes(added=(), removed=()):
+    """
+    Fold added/removed transactions into their monthly buckets.
+
+    Deltas are merged per bucket first, so a bulk write costs one UPDATE per
+    touched (user, month, type, category) rather than one per row. Must run
+    inside the same atomic block as the write it mirrors.
+    """
+    deltas = defaultdict(lambda: [Decimal('0'), 0])
+    for txn in added:
+        delta = deltas[bucket_key(txn)]
+        delta[0] += txn.amount
+        delta[1] += 1
+    for txn in removed:
+        delta = deltas[bucket_key(txn)]
+        delta[0] -= txn.amount
+        delta[1] -= 1
+
+    for (user_id, month, type, category), (amount, count) in deltas.items():
+        if not amount and not count:
+            continue
+        bucket = MonthlyRollup.objects.filter(user_id=user_id, month=month, type=type, category=category)
+        if bucket.update(total=F('total') + amount, count=F('count') + count):
+            continue
+        try:
+            with transaction.atomic():
+                MonthlyRollup.objects.create(
+                    user_id=user_id, month=month, type=type, category=category, total=amount, count=count
+                )
+        except IntegrityError:
+            # Another writer created the bucket first
+            bucket.update(total=F('total') + amount, count=F('count') + count)
+
+
+def expected_buckets(user_id):
+    """Recompute a user's buckets from the raw transactions and the archive."""
+    rows = Transaction.objects.filter(
+        user_id=user_id
+    ).annotate(
+        month=TruncMonth('date')
+    ).values('month', 'type', 'category').annotate(
+        total=Sum('amount'),
+        count=Count('id')
+    ).order_by()
+    buckets = archive.monthly_totals(user_id)
+    for row in rows:
+        key = (row['month'], row['type'], row['category'])
+        total, count = buckets.get(key, (0, 0))
+        buckets[key] = (total + row['total'], count + row['count'])
+    return buckets
+
+
+def stored_buckets(user_id):
+    rows = MonthlyRollup.objects.filter(user_id=user_id, count__gt=0).values_list(
+        'month', 'type', 'category', 'total', 'count'
+    )
+    return {(month, type, category): (total, count) for month, type, category, total, count in rows}
+
+
+def reconcile(user_id):
+    """Return {bucket: (stored, expected)} for every bucket that has drifted."""
+    expected = expected_buckets(user_id)
+    stored = stored_buckets(user_id)
+    return {
+        key: (stored.get(key), expected.get(key))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key) != expected.get(key)
+    }
+
+
+@transaction.atomic
+def rebuild(user_id):
+    MonthlyRollup.objects.filter(user_id=user_id).delete()
+    MonthlyRollup.objects.bulk_create([
+        MonthlyRollup(user_id=user_id, month=month, type=type, category=category, total=total, count=count)
+        for (month, type, category), (total, count) in expected_buckets(user_id).items()
+    ])
+    cache.bump_version_on_commit([user_id])
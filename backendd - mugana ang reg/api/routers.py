@@ -0,0 +1,67 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from . import cache
+
+# The request currently allowed to read from a replica, if any; set by
+# ReplicaRoutingMiddleware for the duration of a read-only view
+_replica_request = ContextVar('replica_request', default=None)
+
+REPLICA_APPS = {'api'}
+
+
+def allow_replica_reads(request):
+    return _replica_request.set(request)
+
+
+def end_replica_reads(token):
+    _replica_request.reset(token)
+
+
+def replica_wanted(model):
+    """
+    True when a read of `model` may go to a replica: inside a replica-routed
+    request, for ledger models only, and unless the requesting user's data
+    changed within the last REPLICA_PIN_SECONDS (every write path bumps the
+    data version, which pins them; see cache.bump_version).
+    """
+    request = _replica_request.get()
+    if request is None or model._meta.app_label not in REPLICA_APPS:
+        return False
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return True
+    # Looked up once per request
+    if not hasattr(request, '_db_pinned'):
+        request._db_pinned = cache.pinned_to_primary(user.pk)
+    return not request._db_pinned
+
+
+class ReplicaRouter:
+    """
+    Routes reads of the ledger tables to a random DATABASE_REPLICAS alias
+    during the views listed in REPLICA_VIEWS; everything else, and every
+    write, uses 'default'. Replicas are copies of 'default', so they are
+    never migrated directly.
+    """
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and replica_wanted(model):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,115 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .filters import filter_transactions
+from .models import Transaction
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+FTS_TABLE = f'{Transaction._meta.db_table}_fts'
+# Same definitions as migration 0011. SQLite drops a table's triggers when a
+# schema migration rebuilds it, so ensure_sqlite_index() puts them back
+# after every migrate.
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON api_transaction BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, description, category) VALUES (new.id, new.description, new.category);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON api_transaction BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, category)
+            VALUES ('delete', old.id, old.description, old.category);
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF description, category ON api_transaction BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, category)
+            VALUES ('delete', old.id, old.description, old.category);
+            INSERT INTO {FTS_TABLE}(rowid, description, category) VALUES (new.id, new.description, new.category);
+        END
+    """,
+}
+
+
+def terms(text):
+    return TOKEN_RE.findall(text or '')
+
+
+def matching(queryset, text):
+    """
+    Narrow a Transaction queryset to rows whose description or category
+    matches every term in `text`, annotated with a `rank` (higher is better).
+
+    Postgres uses the generated `search_vector` column and its GIN index,
+    SQLite the FTS5 table; both are created by migration 0011. Other
+    backends fall back to unranked substring matching.
+    """
+    words = terms(text)
+    table = Transaction._meta.db_table
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        tsquery = "plainto_tsquery('english', %s)"
+        query = ' '.join(words)
+        return queryset.filter(
+            RawSQL(f'"{table}"."search_vector" @@ {tsquery}', [query], output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(f'ts_rank("{table}"."search_vector", {tsquery})', [query], output_field=FloatField())
+        )
+
+    if vendor == 'sqlite':
+        # Quote every term so user input can't use (or break) FTS5 syntax;
+        # space-separated terms are ANDed
+        query = ' '.join(f'"{word}"' for word in words)
+        fts = f'{table}_fts'
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [query])
+        ).annotate(
+            # bm25() is lower-is-better
+            rank=RawSQL(
+                f'(SELECT -bm25({fts}) FROM {fts} WHERE {fts} MATCH %s AND rowid = "{table}"."id")',
+                [query], output_field=FloatField()
+            )
+        )
+
+    condition = Q()
+    for word in words:
+        condition &= Q(description__icontains=word) | Q(category__icontains=word)
+    return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def search(user, text, **filters):
+    """A user's transactions matching `text` and the filters, best match first."""
+    queryset = filter_transactions(Transaction.objects.filter(user=user), **filters)
+    return matching(queryset, text).order_by('-rank', '-date', '-id')
+
+
+def missing_sqlite_triggers(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'api_transaction'")
+        existing = {name for name, in cursor.fetchall()}
+    return sorted(set(SQLITE_TRIGGERS) - existing)
+
+
+def ensure_sqlite_index(connection):
+    """
+    Recreate any FTS5 trigger a table rebuild dropped and reindex, since
+    writes made without them are missing from the index. Returns the
+    recreated trigger names. A no-op before migration 0011 and off SQLite.
+    """
+    if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+        return []
+    missing = missing_sqlite_triggers(connection)
+    if missing:
+        with connection.cursor() as cursor:
+            for name in missing:
+                cursor.execute(SQLITE_TRIGGERS[name])
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return missing
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from accounts.models import CustomUser
-from .models import Budget
+from .models import Budget, BudgetAlert
 from datetime import datetime
 
 
@@ -35,7 +35,11 @@ class RegisterSerializer(serializers.ModelSerializer):
         }
 
 from rest_framework import serializers
-from .models import Transaction
+from django.urls import reverse
+from .models import Job, RequestProfile, Transaction
+from .pagination import TransactionPagination
+from .fast_serializers import ValuesSerializer
+from .reports import REPORT_FILENAMES, parse_report_date
 
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -44,31 +48,19 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
     def validate(self, data):
-        if data['type'] == 'expense' and data['category'] in dict(Transaction.INCOME_CATEGORIES):
-            raise serializers.ValidationError("Invalid category for expense type")
-        elif data['type'] == 'income' and data['category'] in dict(Transaction.EXPENSE_CATEGORIES):
-            raise serializers.ValidationError("Invalid category for income type")
+        error = Transaction.category_error(data['type'], data['category'])
+        if error:
+            raise serializers.ValidationError(error)
         return data
 
 class BudgetSerializer(serializers.ModelSerializer):
-    spent = serializers.SerializerMethodField()
+    spent = serializers.DecimalField(max_digits=14, decimal_places=2, coerce_to_string=False, read_only=True)
     
     class Meta:
         model = Budget
         fields = ['id', 'category', 'amount', 'period', 'start_date', 'end_date', 'created_at', 'spent']
         read_only_fields = ['created_at', 'spent']
         
-    def get_spent(self, obj):
-        from .models import Transaction
-        transactions = Transaction.objects.filter(
-            user=obj.user,
-            type='expense',
-            category=obj.category,
-            date__gte=obj.start_date,
-            date__lte=obj.end_date
-        )
-        return sum(t.amount for t in transactions)
-
     def validate(self, data):
         if float(data.get('amount', 0)) <= 0:
             raise serializers.ValidationError("Budget amount must be greater than 0")
@@ -85,4 +77,124 @@ class BudgetSerializer(serializers.ModelSerializer):
             else:
                 data['end_date'] = data['start_date'] + datetime.timedelta(days=365)
                 
-        return data
\ No newline at end of file
+        return data
+
+class TransactionReadSerializer(ValuesSerializer):
+    # Fast path for lists; TransactionSerializer stays for writes
+    model = Transaction
+    fields = TransactionSerializer.Meta.fields
+
+class BudgetReadSerializer(ValuesSerializer):
+    # Fast path for lists; `spent` is rendered as a number, like BudgetSerializer's
+    model = Budget
+    fields = BudgetSerializer.Meta.fields
+    extra_converters = {'spent': None}
+
+class BudgetAlertSerializer(serializers.ModelSerializer):
+    category = serializers.CharField(source='budget.category', read_only=True)
+
+    class Meta:
+        model = BudgetAlert
+        fields = ['id', 'budget', 'category', 'threshold', 'spent', 'amount', 'read_at', 'created_at']
+        read_only_fields = fields
+
+class JobSerializer(serializers.ModelSerializer):
+    REPORT_KINDS = ('report_csv', 'report_pdf')
+
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'params', 'status', 'error', 'created_at', 'finished_at', 'expires_at', 'download_url']
+        read_only_fields = ['status', 'error', 'created_at', 'finished_at', 'expires_at']
+
+    def get_download_url(self, obj):
+        if obj.status != 'done' or not obj.result:
+            return None
+        request = self.context.get('request')
+        url = reverse('job-download', args=[obj.pk])
+        return request.build_absolute_uri(url) if request else url
+
+    def validate(self, data):
+        params = data.get('params') or {}
+        if not isinstance(params, dict):
+            raise serializers.ValidationError({'params': 'Must be an object'})
+
+        allowed = {'start_date', 'end_date'}
+        if data['kind'] in self.REPORT_KINDS:
+            allowed.add('report_type')
+            if params.get('report_type') not in REPORT_FILENAMES:
+                raise serializers.ValidationError({'params': 'Invalid report type'})
+        elif data['kind'] == 'ledger_csv':
+            allowed.add('type')
+            if params.get('type') and params['type'] not in dict(Transaction.TRANSACTION_TYPES):
+                raise serializers.ValidationError({'params': 'Invalid transaction type'})
+        else:
+            allowed = set()
+
+        unknown = set(params) - allowed
+        if unknown:
+            raise serializers.ValidationError({'params': f"Unexpected parameter(s): {', '.join(sorted(unknown))}"})
+        try:
+            for name in ('start_date', 'end_date'):
+                parse_report_date(params.get(name))
+        except ValueError as e:
+            raise serializers.ValidationError({'params': str(e)})
+
+        data['params'] = params
+        return data
+
+
+class RequestProfileSerializer(serializers.ModelSerializer):
+    user = serializers.StringRelatedField()
+    requested_by = serializers.StringRelatedField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RequestProfile
+        fields = ['id', 'user', 'requested_by', 'view_name', 'method', 'path', 'status_code',
+                  'duration_ms', 'created_at', 'download_url', 'summary']
+
+    def get_download_url(self, obj):
+        request = self.context.get('request')
+        url = reverse('profile-download', args=[obj.pk])
+        return request.build_absolute_uri(url) if request else url
+
+
+class RequestProfileListSerializer(RequestProfileSerializer):
+    class Meta(RequestProfileSerializer.Meta):
+        fields = [name for name in RequestProfileSerializer.Meta.fields if name != 'summary']
+
+
+class TransactionFilterSerializer(serializers.Serializer):
+    """Query parameters accepted by the transaction list and search."""
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    type = serializers.ChoiceField(choices=Transaction.TRANSACTION_TYPES, required=False)
+    # ?category=food&category=shopping or ?category=food,shopping
+    category = serializers.ListField(child=serializers.CharField(max_length=20), required=False)
+    min_amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    ordering = serializers.ChoiceField(choices=list(TransactionPagination.orderings), default='-date')
+
+    def validate_category(self, value):
+        return [category for item in value for category in item.split(',') if category]
+
+    def validate(self, data):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise serializers.ValidationError({'end_date': 'Must not be before start_date'})
+        if data.get('min_amount') is not None and data.get('max_amount') is not None and data['min_amount'] > data['max_amount']:
+            raise serializers.ValidationError({'max_amount': 'Must not be less than min_amount'})
+        return data
+
+    def filters(self):
+        """validated_data as keyword arguments for filters.filter_transactions."""
+        data = self.validated_data
+        return {
+            'start_date': data.get('start_date'),
+            'end_date': data.get('end_date'),
+            'type': data.get('type'),
+            'categories': data.get('category'),
+            'min_amount': data.get('min_amount'),
+            'max_amount': data.get('max_amount'),
+        }
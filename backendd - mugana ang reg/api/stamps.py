@@ -0,0 +1,25 @@
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataStamp
+
+
+def touch(user_ids):
+    """
+    Record that the users' transactions or budgets changed. Runs inside the
+    write's transaction, so it rolls back with it and every worker sees it.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    now = timezone.now()
+    DataStamp.objects.bulk_create(
+        [DataStamp(user_id=user_id, changed_at=now) for user_id in user_ids], ignore_conflicts=True
+    )
+    DataStamp.objects.filter(user_id__in=user_ids).update(version=F('version') + 1, changed_at=now)
+
+
+def current(user_id):
+    """(version, changed_at) of a user's data; (0, None) before their first write."""
+    stamp = DataStamp.objects.filter(user_id=user_id).values_list('version', 'changed_at').first()
+    return stamp or (0, None)
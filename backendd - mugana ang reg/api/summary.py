@@ -0,0 +1,93 @@
+from dateutil.relativedelta import relativedelta
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import MonthlyRollup, Transaction
+
+# Number of months (including the current one) shown in spendingOverTime
+SERIES_MONTHS = 6
+
+
+def build_dashboard_summary(user, today=None):
+    """
+    Compute every dashboard figure from the monthly rollups for the previous
+    months, one conditional aggregate over the current month and one query
+    for the recent transactions.
+    """
+    today = today or timezone.localdate()
+    first_day_of_month = today.replace(day=1)
+    last_month = first_day_of_month - relativedelta(months=1)
+    window_start = first_day_of_month - relativedelta(months=SERIES_MONTHS - 1)
+    window_end = first_day_of_month + relativedelta(months=1)
+
+    months = [first_day_of_month - relativedelta(months=i) for i in range(SERIES_MONTHS - 1, -1, -1)]
+    series = {month: {'income': 0, 'expenses': 0} for month in months}
+    current = {'income': 0, 'expenses': 0}
+    previous = {'income': 0, 'expenses': 0}
+    expenses_by_category = {}
+
+    past_buckets = MonthlyRollup.objects.filter(
+        user=user,
+        month__gte=window_start,
+        month__lt=first_day_of_month
+    ).values('month', 'type').annotate(
+        total=Sum('total')
+    ).order_by()
+
+    for row in past_buckets:
+        key = 'income' if row['type'] == 'income' else 'expenses'
+        series[row['month']][key] += row['total']
+        if row['month'] == last_month:
+            previous[key] += row['total']
+
+    # The current month needs a month-to-date cut the rollups can't give, so
+    # it is read from the raw rows over a plain date range (index friendly,
+    # unlike date__year/date__month). `current` only counts rows up to today
+    # for the headline figures while `total` covers the whole month for
+    # the series.
+    current_rows = Transaction.objects.filter(
+        user=user,
+        date__gte=first_day_of_month,
+        date__lt=window_end
+    ).values('type', 'category').annotate(
+        total=Sum('amount'),
+        current=Sum('amount', filter=Q(date__lte=today))
+    ).order_by()
+
+    for row in current_rows:
+        key = 'income' if row['type'] == 'income' else 'expenses'
+        series[first_day_of_month][key] += row['total']
+        if row['current'] is None:
+            continue
+        current[key] += row['current']
+        if row['type'] == 'expense':
+            expenses_by_category[row['category']] = (
+                expenses_by_category.get(row['category'], 0) + row['current']
+            )
+
+    balance = current['income'] - current['expenses']
+    last_month_total = previous['income'] - previous['expenses']
+
+    monthly_change = 0
+    if last_month_total != 0:
+        monthly_change = round(((balance - last_month_total) / abs(last_month_total)) * 100, 2)
+
+    recent_transactions = Transaction.objects.filter(
+        user=user
+    ).order_by('-date', '-created_at')[:5]
+
+    return {
+        'total_income': current['income'],
+        'total_expenses': current['expenses'],
+        'balance': balance,
+        'monthly_change': monthly_change,
+        'expenses_by_category': [
+            {'category': category, 'amount': amount}
+            for category, amount in sorted(expenses_by_category.items(), key=lambda item: -item[1])
+        ],
+        'recent_transactions': recent_transactions,
+        'spending_over_time': [
+            {'date': month.strftime('%b'), **series[month]}
+            for month in months
+        ],
+    }
@@ -1,3 +1,1327 @@
-from django.test import TestCase
+import datetime as dt
+import gzip
+import json
+import marshal
+import os
+import re
+import shutil
+import tempfile
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import CustomUser
+from . import archive, budgets, cache as report_cache, jobs, metrics, partitions, profiling, rollups, routers, search
+from .ledger import record_changes
+from .models import Budget, BudgetAlert, Job, MonthlyRollup, RequestProfile, Transaction, TransactionArchive
+from .middleware import accepted_encodings
+from .renderers import ORJSONRenderer
+from .reports import category_totals
+from .serializers import BudgetSerializer, TransactionSerializer
+from .summary import build_dashboard_summary
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email="owner@example.com", name="Owner", password="secret-pass-123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_transaction(self, amount, type, category, on, user=None, description=""):
+        transaction = Transaction.objects.create(
+            user=user or self.user,
+            amount=Decimal(amount),
+            type=type,
+            category=category,
+            date=on,
+            description=description,
+        )
+        record_changes(added=[transaction])
+        return transaction
+
+
+class DashboardSummaryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = date(2025, 5, 20)
+        self.add_transaction("1000.00", "income", "salary", date(2025, 5, 1))
+        self.add_transaction("200.00", "expense", "food", date(2025, 5, 3))
+        self.add_transaction("50.00", "expense", "shopping", date(2025, 5, 10))
+        # Future-dated rows count towards the series but not month-to-date totals
+        self.add_transaction("75.00", "expense", "food", date(2025, 5, 28))
+        self.add_transaction("800.00", "income", "salary", date(2025, 4, 1))
+        self.add_transaction("400.00", "expense", "utilities", date(2025, 4, 15))
+        self.add_transaction("300.00", "income", "gift", date(2024, 12, 24))
+        # Outside the six month window
+        self.add_transaction("999.00", "income", "salary", date(2024, 11, 30))
+
+    def test_figures(self):
+        summary = build_dashboard_summary(self.user, today=self.today)
+
+        self.assertEqual(summary['total_income'], Decimal("1000.00"))
+        self.assertEqual(summary['total_expenses'], Decimal("250.00"))
+        self.assertEqual(summary['balance'], Decimal("750.00"))
+        # Last month balance was 400, this month 750
+        self.assertEqual(summary['monthly_change'], Decimal("87.50"))
+        self.assertEqual(summary['expenses_by_category'], [
+            {'category': 'food', 'amount': Decimal("200.00")},
+            {'category': 'shopping', 'amount': Decimal("50.00")},
+        ])
+        self.assertEqual(summary['spending_over_time'], [
+            {'date': 'Dec', 'income': Decimal("300.00"), 'expenses': 0},
+            {'date': 'Jan', 'income': 0, 'expenses': 0},
+            {'date': 'Feb', 'income': 0, 'expenses': 0},
+            {'date': 'Mar', 'income': 0, 'expenses': 0},
+            {'date': 'Apr', 'income': Decimal("800.00"), 'expenses': Decimal("400.00")},
+            {'date': 'May', 'income': Decimal("1000.00"), 'expenses': Decimal("325.00")},
+        ])
+
+    def test_endpoint_query_count(self):
+        for day in range(1, 20):
+            self.add_transaction("1.00", "expense", "other", date(2025, 3, day))
+
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/dashboard/summary/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['recentTransactions']), 5)
+        self.assertEqual(len(response.data['spendingOverTime']), 6)
+
+
+class MonthlyRollupTests(APITestCase):
+    def bucket(self, month, type, category):
+        return MonthlyRollup.objects.get(user=self.user, month=month, type=type, category=category)
+
+    def test_views_keep_rollups_in_step(self):
+        response = self.client.post("/api/transactions/", {
+            "amount": "40.00", "type": "expense", "category": "food", "date": "2025-03-10"
+        })
+        self.assertEqual(response.status_code, 201)
+        self.client.post("/api/transactions/", {
+            "amount": "10.00", "type": "expense", "category": "food", "date": "2025-03-12"
+        })
+        bucket = self.bucket(date(2025, 3, 1), "expense", "food")
+        self.assertEqual((bucket.total, bucket.count), (Decimal("50.00"), 2))
+
+        self.client.put(f"/api/transactions/{response.data['id']}/", {
+            "amount": "25.00", "type": "expense", "category": "shopping", "date": "2025-04-01"
+        })
+        bucket.refresh_from_db()
+        self.assertEqual((bucket.total, bucket.count), (Decimal("10.00"), 1))
+        moved = self.bucket(date(2025, 4, 1), "expense", "shopping")
+        self.assertEqual((moved.total, moved.count), (Decimal("25.00"), 1))
+
+        self.client.delete(f"/api/transactions/{response.data['id']}/")
+        moved.refresh_from_db()
+        self.assertEqual((moved.total, moved.count), (Decimal("0.00"), 0))
+        self.assertEqual(rollups.reconcile(self.user.id), {})
+
+    def test_category_totals_combine_rollups_and_partial_months(self):
+        self.add_transaction("100.00", "expense", "food", date(2025, 1, 5))
+        self.add_transaction("30.00", "expense", "food", date(2025, 2, 14))
+        self.add_transaction("20.00", "expense", "shopping", date(2025, 3, 2))
+        self.add_transaction("70.00", "expense", "shopping", date(2025, 3, 20))
+        self.add_transaction("500.00", "income", "salary", date(2025, 2, 1))
+
+        self.assertEqual(category_totals(self.user, "expense", date(2025, 1, 10), date(2025, 3, 10)), [
+            {'category': 'food', 'total': Decimal("30.00")},
+            {'category': 'shopping', 'total': Decimal("20.00")},
+        ])
+        self.assertEqual(category_totals(self.user, "expense"), [
+            {'category': 'food', 'total': Decimal("130.00")},
+            {'category': 'shopping', 'total': Decimal("90.00")},
+        ])
+        self.assertEqual(category_totals(self.user, "expense", date(2025, 3, 1), date(2025, 3, 31)), [
+            {'category': 'shopping', 'total': Decimal("90.00")},
+        ])
+
+        response = self.client.get("/api/reports/trends/")
+        self.assertEqual([(row['month'], row['type'], row['total']) for row in response.data], [
+            (date(2025, 1, 1), "expense", Decimal("100.00")),
+            (date(2025, 2, 1), "expense", Decimal("30.00")),
+            (date(2025, 2, 1), "income", Decimal("500.00")),
+            (date(2025, 3, 1), "expense", Decimal("90.00")),
+        ])
+
+    def test_rebuild_command_reconciles_drift(self):
+        self.add_transaction("12.00", "expense", "food", date(2025, 6, 1))
+        # Simulate a write that bypassed the ledger hooks
+        Transaction.objects.create(
+            user=self.user, amount=Decimal("8.00"), type="expense", category="food", date=date(2025, 6, 2)
+        )
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_rollups", "--check", stdout=StringIO())
+        call_command("rebuild_rollups", "--user", self.user.email, stdout=StringIO())
+
+        self.assertEqual(rollups.reconcile(self.user.id), {})
+        self.assertEqual(self.bucket(date(2025, 6, 1), "expense", "food").total, Decimal("20.00"))
+
+
+class BudgetSpentTests(APITestCase):
+    def test_list_computes_spent_in_one_query(self):
+        Budget.objects.create(
+            user=self.user, category="food", amount=Decimal("300.00"),
+            start_date=date(2025, 3, 1), end_date=date(2025, 3, 31)
+        )
+        Budget.objects.create(
+            user=self.user, category="food", amount=Decimal("300.00"),
+            start_date=date(2025, 4, 1), end_date=date(2025, 4, 30)
+        )
+        Budget.objects.create(
+            user=self.user, category="shopping", amount=Decimal("100.00"),
+            start_date=date(2025, 3, 1), end_date=date(2025, 3, 31)
+        )
+        self.add_transaction("20.00", "expense", "food", date(2025, 3, 1))
+        self.add_transaction("15.50", "expense", "food", date(2025, 3, 31))
+        self.add_transaction("99.00", "expense", "food", date(2025, 4, 1))
+        self.add_transaction("40.00", "income", "other", date(2025, 3, 5))
+        other = CustomUser.objects.create_user(email="other@example.com", name="Other", password="secret-pass-123")
+        self.add_transaction("500.00", "expense", "food", date(2025, 3, 2), user=other)
+
+        # The conditional-GET stamp and the budget list
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/budgets/")
+
+        spent = {(row['category'], row['start_date']): row['spent'] for row in response.data}
+        self.assertEqual(spent, {
+            ("food", "2025-03-01"): Decimal("35.50"),
+            ("food", "2025-04-01"): Decimal("99.00"),
+            ("shopping", "2025-03-01"): Decimal("0"),
+        })
+
+
+class TransactionPaginationTests(APITestCase):
+    def test_pages_walk_the_ledger_without_gaps(self):
+        for day in (3, 3, 3, 2, 2, 1, 1):
+            self.add_transaction("1.00", "expense", "food", date(2025, 1, day))
+        expected = [t.id for t in Transaction.objects.filter(user=self.user).order_by('-date', '-created_at', '-id')]
+
+        seen, url = [], "/api/transactions/?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, expected)
+
+    def test_page_size_is_capped_and_bad_cursor_rejected(self):
+        for day in range(1, 4):
+            self.add_transaction("1.00", "expense", "food", date(2025, 1, day))
+
+        response = self.client.get("/api/transactions/?page_size=100000")
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get("/api/transactions/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 404)
+
+    def test_filters_and_ordering_page_together(self):
+        rows = [
+            self.add_transaction("15.00", "expense", "food", date(2025, 1, 3)),
+            self.add_transaction("40.00", "expense", "shopping", date(2025, 1, 5)),
+            self.add_transaction("40.00", "expense", "food", date(2025, 1, 9)),
+            self.add_transaction("90.00", "expense", "utilities", date(2025, 1, 9)),
+            self.add_transaction("25.00", "expense", "food", date(2025, 2, 1)),
+            self.add_transaction("500.00", "income", "salary", date(2025, 1, 4)),
+        ]
+
+        seen, url = [], "/api/transactions/?start_date=2025-01-01&end_date=2025-01-31&type=expense" \
+                        "&category=food,shopping&category=utilities&min_amount=20&ordering=-amount&page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        # Equal amounts fall back to id, descending
+        self.assertEqual(seen, [rows[3].id, rows[2].id, rows[1].id])
+
+        response = self.client.get("/api/transactions/?ordering=date&max_amount=30")
+        self.assertEqual([row['id'] for row in response.data['results']], [rows[0].id, rows[4].id])
+
+        response = self.client.get("/api/transactions/?type=refund&min_amount=5&max_amount=1&ordering=size")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'type', 'ordering'})
+        response = self.client.get("/api/transactions/?min_amount=5&max_amount=1")
+        self.assertIn('max_amount', response.data)
+
+        # A cursor only continues the ordering it was issued for
+        cursor = self.client.get("/api/transactions/?page_size=1").data['next']
+        self.assertEqual(self.client.get(cursor + "&ordering=amount").status_code, 404)
+
+
+class CSVExportTests(APITestCase):
+    def read_csv(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_report_export_writes_amounts(self):
+        self.add_transaction("12.50", "expense", "food", date(2025, 2, 1))
+        self.add_transaction("7.25", "expense", "shopping", date(2025, 2, 3))
+
+        response = self.client.get("/api/reports/spending/?export=csv")
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(self.read_csv(response), ["Category,Amount", "food,12.50", "shopping,7.25"])
+
+    def test_ledger_export_filters_by_date_range(self):
+        self.add_transaction("1.00", "expense", "food", date(2025, 1, 31), description="too early")
+        self.add_transaction("2.00", "income", "gift", date(2025, 2, 1), description="birthday, card")
+        self.add_transaction("3.00", "expense", "food", date(2025, 2, 28))
+
+        response = self.client.get("/api/transactions/export/?start_date=2025-02-01&end_date=2025-02-28")
+
+        self.assertEqual(self.read_csv(response), [
+            "Date,Type,Category,Amount,Description",
+            '2025-02-01,income,gift,2.00,"birthday, card"',
+            "2025-02-28,expense,food,3.00,",
+        ])
+        self.assertEqual(self.client.get("/api/transactions/export/?start_date=nope").status_code, 400)
+
+
+class JobQueueTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_export_job_round_trip(self):
+        self.add_transaction("9.99", "expense", "food", date(2025, 1, 2))
+        request = {"kind": "ledger_csv", "params": {"start_date": "2025-01-01"}}
+
+        response = self.client.post("/api/jobs/", request, format="json")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['id']
+
+        # An identical request is deduplicated onto the queued job
+        response = self.client.post("/api/jobs/", request, format="json")
+        self.assertEqual((response.status_code, response.data['id']), (200, job_id))
+        self.assertEqual(self.client.get(f"/api/jobs/{job_id}/download/").status_code, 409)
+
+        call_command("run_jobs", "--once")
+
+        response = self.client.get(f"/api/jobs/{job_id}/")
+        self.assertEqual(response.data['status'], "done")
+        response = self.client.get(response.data['download_url'])
+        self.assertEqual(
+            b"".join(response.streaming_content).decode().splitlines(),
+            ["Date,Type,Category,Amount,Description", "2025-01-02,expense,food,9.99,"]
+        )
+
+    def test_finished_artifacts_are_not_reused_after_a_write(self):
+        request = {"kind": "ledger_csv", "params": {}}
+        job_id = self.client.post("/api/jobs/", request, format="json").data['id']
+        call_command("run_jobs", "--once")
+        self.assertEqual(self.client.post("/api/jobs/", request, format="json").data['id'], job_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_transaction("9.99", "expense", "food", date(2025, 1, 2))
+        response = self.client.post("/api/jobs/", request, format="json")
+        self.assertEqual(response.status_code, 202)
+        self.assertNotEqual(response.data['id'], job_id)
+
+    def test_concurrent_enqueue_returns_the_winner(self):
+        first, created = jobs.enqueue(self.user, "ledger_csv", {})
+        self.assertTrue(created)
+        # The loser's existence check ran before the winner's insert
+        original_filter = Job.objects.filter
+        misses = iter([True])
+
+        def filter_missing_once(*args, **kwargs):
+            queryset = original_filter(*args, **kwargs)
+            return queryset.none() if kwargs.get("dedupe_key") and next(misses, False) else queryset
+
+        with mock.patch.object(Job.objects, "filter", side_effect=filter_missing_once):
+            job, created = jobs.enqueue(self.user, "ledger_csv", {})
+        self.assertEqual((job.pk, created), (first.pk, False))
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_pdf_report_export_is_queued(self):
+        self.add_transaction("9.99", "expense", "food", date(2025, 1, 2))
+        response = self.client.get("/api/reports/spending/?export=pdf&start_date=2025-01-01")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["params"], {"report_type": "spending", "start_date": "2025-01-01"})
+        self.assertTrue(response["Location"].endswith(f"/api/jobs/{response.data['id']}/"))
+
+        call_command("run_jobs", "--once")
+        again = self.client.get("/api/reports/spending/?export=pdf&start_date=2025-01-01")
+        self.assertEqual((again.status_code, again.data["id"]), (200, response.data["id"]))
+        download = self.client.get(again.data["download_url"])
+        self.assertTrue(b"".join(download.streaming_content).startswith(b"%PDF"))
+
+    def test_failure_after_the_handler_still_fails_the_job(self):
+        job, _ = jobs.enqueue(self.user, "ledger_csv", {})
+        with mock.patch("django.db.models.fields.files.FieldFile.save", side_effect=OSError("disk full")), \
+                self.assertLogs("api.jobs", "ERROR"):
+            call_command("run_jobs", "--once")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ("failed", "disk full"))
+        # Nothing active is left to block the retry
+        retry, created = jobs.enqueue(self.user, "ledger_csv", {})
+        self.assertTrue(created)
+        self.assertNotEqual(retry.pk, job.pk)
+
+    def test_invalid_params_and_expired_artifacts(self):
+        response = self.client.post("/api/jobs/", {"kind": "report_pdf", "params": {"report_type": "bogus"}}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post("/api/jobs/", {"kind": "report_pdf", "params": {"report_type": "spending"}}, format="json")
+        call_command("run_jobs", "--once")
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertTrue(job.result.read().startswith(b"%PDF"))
+        job.result.close()
+
+        Job.objects.filter(pk=job.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.client.get(f"/api/jobs/{job.pk}/download/").status_code, 410)
+        jobs.purge_expired()
+        self.assertFalse(Job.objects.filter(pk=job.pk).exists())
+
+
+class TransactionImportTests(APITestCase):
+    def upload(self, name, content, **extra):
+        return self.client.post("/api/transactions/import/", {
+            "file": SimpleUploadedFile(name, content.encode()), **extra
+        })
+
+    def test_csv_import_reports_bad_rows(self):
+        content = (
+            "Date,Type,Category,Amount,Description\n"
+            "2025-01-05,expense,food,12.30,Lunch\n"
+            "2025-01-06,expense,salary,5.00,wrong category\n"
+            "not-a-date,income,salary,100.00,\n"
+            "2025-01-07,income,other,1500.00,Side job\n"
+        )
+        response = self.upload("ledger.csv", content)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 2))
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+        self.assertIn('date', response.data['errors'][1]['errors'])
+        self.assertEqual(
+            sorted(Transaction.objects.filter(user=self.user).values_list('description', flat=True)),
+            ["Lunch", "Side job"]
+        )
+        self.assertEqual(rollups.reconcile(self.user.id), {})
+
+    def test_unreadable_file_stores_nothing(self):
+        rows = "".join(f"2025-01-{day % 28 + 1:02d},expense,food,1.00,Row {day}\n" for day in range(400))
+        content = ("Date,Type,Category,Amount,Description\n" + rows).encode() + b"2025-01-05,expense,food,2.00,\xff\xfe\n"
+        with mock.patch("api.imports.IMPORT_BATCH_SIZE", 10):
+            response = self.client.post("/api/transactions/import/", {
+                "file": SimpleUploadedFile("ledger.csv", content)
+            })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Could not read file", response.data["error"])
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+        self.assertFalse(MonthlyRollup.objects.filter(user=self.user).exists())
+
+    def test_ofx_import(self):
+        content = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20250203120000
+<TRNAMT>-42.10
+<NAME>Grocer
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250205<TRNAMT>2000.00<NAME>Payroll</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+        response = self.upload("bank.ofx", content, expense_category="food", income_category="salary")
+
+        self.assertEqual(response.data['created'], 2)
+        rows = Transaction.objects.filter(user=self.user).order_by('date').values_list('date', 'type', 'category', 'amount')
+        self.assertEqual(list(rows), [
+            (date(2025, 2, 3), "expense", "food", Decimal("42.10")),
+            (date(2025, 2, 5), "income", "salary", Decimal("2000.00")),
+        ])
+
+
+class TransactionBatchTests(APITestCase):
+    def test_batch_applies_everything_in_one_transaction(self):
+        lunch = self.add_transaction("12.00", "expense", "food", date(2025, 3, 1))
+        taxi = self.add_transaction("30.00", "expense", "transportation", date(2025, 3, 2))
+        cinema = self.add_transaction("15.00", "expense", "entertainment", date(2025, 3, 3))
+
+        response = self.client.post("/api/transactions/batch/", {"operations": [
+            {"op": "update", "id": lunch.id, "data": {"category": "shopping"}},
+            {"op": "update", "id": taxi.id, "data": {"category": "shopping"}},
+            {"op": "delete", "id": cinema.id},
+            {"op": "create", "data": {"amount": "99.00", "type": "income", "category": "gift", "date": "2025-03-04"}},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], ["ok"] * 4)
+        self.assertEqual(
+            sorted(Transaction.objects.filter(user=self.user).values_list('category', flat=True)),
+            ["gift", "shopping", "shopping"]
+        )
+        self.assertEqual(rollups.reconcile(self.user.id), {})
+
+    def test_invalid_operation_rolls_back_the_batch(self):
+        lunch = self.add_transaction("12.00", "expense", "food", date(2025, 3, 1))
+        other = CustomUser.objects.create_user(email="other@example.com", name="Other", password="secret-pass-123")
+        foreign = self.add_transaction("1.00", "expense", "food", date(2025, 3, 1), user=other)
+
+        response = self.client.post("/api/transactions/batch/", {"operations": [
+            {"op": "delete", "id": lunch.id},
+            {"op": "update", "id": lunch.id, "data": {"category": "salary"}},
+            {"op": "delete", "id": foreign.id},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['status'] for result in response.data['results']], ["skipped", "error", "error"])
+        self.assertTrue(Transaction.objects.filter(pk=lunch.pk).exists())
+        self.assertTrue(Transaction.objects.filter(pk=foreign.pk).exists())
+
+
+class ReportCacheTests(APITestCase):
+    def test_reports_are_served_from_cache_until_the_next_write(self):
+        self.add_transaction("10.00", "expense", "food", date(2025, 1, 10))
+
+        self.client.get("/api/reports/spending/")
+        # Only the conditional-GET stamp hits the database
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/reports/spending/")
+        self.assertEqual(response.data, [{'category': 'food', 'total': Decimal("10.00")}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/transactions/", {
+                "amount": "5.00", "type": "expense", "category": "food", "date": "2025-01-11"
+            })
+
+        response = self.client.get("/api/reports/spending/")
+        self.assertEqual(response.data, [{'category': 'food', 'total': Decimal("15.00")}])
+
+    def test_budget_writes_invalidate_and_stats_are_exposed(self):
+        version = report_cache.data_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/budgets/", {
+                "category": "food", "amount": "100.00", "period": "monthly",
+                "start_date": "2025-01-01", "end_date": "2025-01-31"
+            })
+        self.assertNotEqual(report_cache.data_version(self.user.pk), version)
+
+        self.assertEqual(self.client.get("/api/cache/stats/").status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(set(self.client.get("/api/cache/stats/").data), {'hits', 'misses', 'hit_ratio'})
+
+
+class ConditionalGetTests(APITestCase):
+    def test_matching_etag_short_circuits_until_data_changes(self):
+        self.add_transaction("10.00", "expense", "food", date(2025, 1, 10))
+
+        response = self.client.get("/api/transactions/")
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+        self.assertIn("Authorization", response["Vary"])
+
+        # Only the stamp lookup runs; nothing is serialized
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/transactions/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get("/api/transactions/?page_size=5")["ETag"], etag)
+
+        for url in ("/api/budgets/", "/api/reports/spending/", "/api/dashboard/summary/"):
+            tag = self.client.get(url)["ETag"]
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=tag).status_code, 304, url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transaction = Transaction.objects.get(user=self.user)
+            self.client.delete(f"/api/transactions/{transaction.pk}/")
+        self.assertEqual(self.client.get("/api/transactions/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_validators_are_one_primary_key_lookup(self):
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, amount=Decimal("1.00"), type="expense", category="food",
+                        date=date(2024, 1, 1) + timedelta(days=i % 365))
+            for i in range(500)
+        ])
+        self.add_transaction("10.00", "expense", "food", date(2025, 1, 10))
+        etag = self.client.get("/api/transactions/")["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/transactions/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        sql, = [query["sql"] for query in queries.captured_queries]
+        self.assertIn("api_datastamp", sql)
+        self.assertNotIn("api_transaction", sql)
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("EXPLAIN " + sql)
+                self.assertNotIn("Seq Scan", "\n".join(row[0] for row in cursor.fetchall()))
+            else:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                self.assertRegex(cursor.fetchall()[0][-1], r"^SEARCH api_datastamp USING (INTEGER PRIMARY KEY|INDEX \S+ \(user_id=\?\))")
+
+        # A write in another process is seen through the database, not a local cache
+        with mock.patch("api.cache.bump_version"):
+            self.add_transaction("2.00", "expense", "food", date(2025, 1, 11))
+        self.assertEqual(self.client.get("/api/transactions/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_dashboard_validators_change_with_the_date(self):
+        today = timezone.localdate()
+        with mock.patch("django.utils.timezone.localdate", return_value=today):
+            response = self.client.get("/api/dashboard/summary/")
+            etag, last_modified = response["ETag"], response["Last-Modified"]
+            self.assertEqual(self.client.get("/api/dashboard/summary/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with mock.patch("django.utils.timezone.localdate", return_value=today + timedelta(days=1)):
+            self.assertEqual(self.client.get("/api/dashboard/summary/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+            self.assertEqual(
+                self.client.get("/api/dashboard/summary/", HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200
+            )
+
+    def test_representations_have_their_own_etag(self):
+        response = self.client.get("/api/transactions/")
+        self.assertIn("Accept", response["Vary"])
+        other = self.client.get("/api/transactions/", HTTP_ACCEPT="application/msgpack")
+        self.assertNotEqual(other["ETag"], response["ETag"])
+        self.assertEqual(self.client.get(
+            "/api/transactions/", HTTP_ACCEPT="application/msgpack", HTTP_IF_NONE_MATCH=response["ETag"]
+        ).status_code, 200)
+
+
+class QueryPlanTests(APITestCase):
+    """
+    Runs the hot endpoints against a few thousand rows and EXPLAINs every
+    SELECT they issue, failing if any of them falls back to a full scan of
+    a ledger table (or, on SQLite, sorts outside the index). Catches index
+    regressions before they reach production.
+    """
+    HOT_TABLES = ("api_transaction", "api_budget", "api_monthlyrollup")
+    CATEGORIES = ("food", "transportation", "utilities", "entertainment", "shopping", "healthcare")
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            CustomUser.objects.create_user(email=f"load{i}@example.com", name=f"Load {i}", password="x")
+            for i in range(3)
+        ]
+        rows = []
+        for user in users:
+            for i in range(800):
+                on = date(2024, 1, 1) + timedelta(days=i % 540)
+                income = i % 10 == 0
+                rows.append(Transaction(
+                    user=user,
+                    amount=Decimal(5 + i % 200),
+                    type="income" if income else "expense",
+                    category="salary" if income else cls.CATEGORIES[i % len(cls.CATEGORIES)],
+                    date=on,
+                ))
+        Transaction.objects.bulk_create(rows, batch_size=1000)
+        Budget.objects.bulk_create([
+            Budget(
+                user=user, category=category, amount=Decimal("300.00"), period="monthly",
+                start_date=date(2024, month, 1), end_date=date(2024, month, 28)
+            )
+            for user in users for category in cls.CATEGORIES for month in range(1, 13)
+        ])
+        for user in users:
+            rollups.rebuild(user.pk)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        cls.load_user = users[0]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.load_user)
+
+    def bad_plan_lines(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Small test tables would make a seq scan the cheapest plan anyway;
+                # disabling them shows whether an index path exists at all
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("EXPLAIN " + sql)
+                pattern = r"Seq Scan on (%s)\b" % "|".join(self.HOT_TABLES)
+            else:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                # A temp b-tree for ORDER BY means the index doesn't match the sort
+                pattern = r"^SCAN (%s)\b|TEMP B-TREE FOR ORDER BY" % "|".join(self.HOT_TABLES)
+            plan = [row[-1] for row in cursor.fetchall()]
+        return [line for line in plan if re.search(pattern, line.strip())]
+
+    def test_hot_queries_use_indexes(self):
+        urls = [
+            "/api/transactions/",
+            "/api/transactions/?type=expense&start_date=2024-02-01&end_date=2024-02-29",
+            "/api/transactions/?category=food&category=shopping&ordering=date",
+            "/api/transactions/?ordering=-amount&min_amount=50",
+            "/api/dashboard/summary/",
+            "/api/budgets/",
+            "/api/reports/spending/?start_date=2024-02-10&end_date=2024-09-20",
+            "/api/reports/income/?start_date=2024-02-10&end_date=2024-09-20",
+            "/api/reports/trends/",
+            "/api/transactions/export/?start_date=2024-03-01&end_date=2024-03-31",
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            for url in urls:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200, url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            cursor = self.client.get("/api/transactions/").data["next"]
+            self.client.get(cursor)
+
+        checked = 0
+        for query in queries.captured_queries:
+            sql = query["sql"]
+            if not sql.lstrip().upper().startswith("SELECT") or not any(t in sql for t in self.HOT_TABLES):
+                continue
+            checked += 1
+            self.assertEqual(self.bad_plan_lines(sql), [], sql)
+        self.assertGreater(checked, 10)
+
+
+class LoadTestTests(TestCase):
+    def test_seed_then_benchmark(self):
+        call_command("seed_load_data", users=3, transactions=40, budgets=6, seed=1, stdout=StringIO())
+
+        generated = CustomUser.objects.filter(email__endswith="@loadtest.invalid")
+        self.assertEqual(generated.count(), 3)
+        self.assertEqual(Transaction.objects.filter(user__in=generated).count(), 120)
+        self.assertEqual(Budget.objects.filter(user__in=generated).count(), 18)
+        for user in generated:
+            self.assertEqual(rollups.reconcile(user.pk), {})
+
+        output = os.path.join(tempfile.mkdtemp(), "bench.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        call_command(
+            "run_benchmark", rounds=2, host="testserver", seed=1, output=output,
+            endpoint=["login", "transactions_list", "transactions_create", "dashboard"], stdout=StringIO()
+        )
+        with open(output) as f:
+            report = json.load(f)
+
+        self.assertEqual(set(report["endpoints"]), {"login", "transactions_list", "transactions_create", "dashboard"})
+        self.assertEqual(report["total"]["requests"], 8)
+        self.assertEqual(report["total"]["errors"], 0)
+        listing = report["endpoints"]["transactions_list"]
+        self.assertLessEqual(listing["latency_ms"]["p50"], listing["latency_ms"]["p99"])
+        self.assertGreater(listing["queries_per_request"], 0)
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_requests_are_timed_and_exported(self):
+        self.add_transaction("10.00", "expense", "food", date(2025, 1, 10))
+
+        response = self.client.get("/api/transactions/")
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", render;dur=[\d.]+')
+
+        body = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret").content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="transactions-list",method="GET",status="200"} 1', body)
+        self.assertIn('db_queries_per_request_bucket{view="transactions-list",le="+Inf"} 1', body)
+        self.assertIn('http_response_size_bytes_sum{view="transactions-list"} %d.0' % len(response.content), body)
+        self.assertIn("report_cache_hits_total", body)
+        # Scrapes don't measure themselves, and unresolved URLs add no series
+        self.client.get("/nowhere/")
+        self.assertNotIn('view="metrics"', self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret").content.decode())
+        self.assertEqual(len(metrics.REQUEST_LATENCY.series), 1)
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_token_protects_the_endpoint(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret").status_code, 200)
+
+    def test_workers_are_summed_through_the_shared_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # Another worker's last flush
+        other = {
+            "histograms": {"db_queries_per_request": [[["transactions-list"], [0, 1] + [0] * 9, 1.0, 1]]},
+            "report_cache": {"hits": 4, "misses": 1},
+        }
+        with open(os.path.join(directory, "99999-other.json"), "w") as f:
+            json.dump(other, f)
+
+        with self.settings(METRICS_DIR=directory, METRICS_TOKEN="scrape-secret"):
+            self.client.get("/api/transactions/")
+            body = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret").content.decode()
+        self.assertIn('db_queries_per_request_count{view="transactions-list"} 2', body)
+        self.assertIn('db_queries_per_request_bucket{view="transactions-list",le="1.0"} 1', body)
+        self.assertRegex(body, r"report_cache_hits_total [4-9]")
+        self.assertEqual(len([name for name in os.listdir(directory) if name.endswith(".json")]), 2)
+
+    def test_endpoint_is_closed_without_a_token(self):
+        self.assertIsNone(settings.METRICS_TOKEN)
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.add_transaction("10.00", "expense", "food", date(2025, 1, 10))
+
+    def bearer(self, user):
+        return {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    def test_staff_can_profile_a_request_and_download_it(self):
+        self.user.is_staff = True
+        self.user.save()
+        client = APIClient()
+
+        response = client.get("/api/dashboard/summary/", HTTP_X_PROFILE="1", **self.bearer(self.user))
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get(pk=response["X-Profile-Id"])
+        self.assertEqual((profile.user, profile.requested_by), (self.user, self.user))
+        self.assertEqual(profile.view_name, "dashboard-summary")
+
+        listing = self.client.get("/api/profiles/").data
+        self.assertEqual([row["id"] for row in listing], [str(profile.pk)])
+        self.assertNotIn("summary", listing[0])
+        detail = self.client.get(f"/api/profiles/{profile.pk}/").data
+        self.assertTrue(any("build_dashboard_summary" in row["function"] for row in detail["summary"]["functions"]))
+        self.assertIn("allocations", detail["summary"])
+
+        download = self.client.get(f"/api/profiles/{profile.pk}/download/")
+        stats = marshal.loads(b"".join(download.streaming_content))
+        self.assertTrue(any(func[2] == "build_dashboard_summary" for func in stats))
+
+    def test_non_staff_flags_are_ignored_but_sampling_applies(self):
+        client = APIClient()
+        response = client.get("/api/reports/spending/?profile=1", **self.bearer(self.user))
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(self.client.get("/api/profiles/").status_code, 403)
+
+        with self.settings(PROFILING_SAMPLE_RATE=1.0):
+            self.assertIn("X-Profile-Id", client.get("/api/reports/spending/", **self.bearer(self.user)))
+            self.assertNotIn("X-Profile-Id", client.get("/api/transactions/", **self.bearer(self.user)))
+        self.assertEqual(RequestProfile.objects.get().requested_by, None)
+
+    def test_overlapping_profiles_share_tracemalloc(self):
+        self.user.is_staff = True
+        self.user.save()
+        # Another profiled request is still in flight
+        profiling.start_tracing()
+        try:
+            response = APIClient().get("/api/dashboard/summary/", HTTP_X_PROFILE="1", **self.bearer(self.user))
+            self.assertIn("X-Profile-Id", response)
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            profiling.stop_tracing()
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_profiling_errors_do_not_fail_the_request(self):
+        self.user.is_staff = True
+        self.user.save()
+        with mock.patch("api.profiling.tracemalloc.take_snapshot", side_effect=RuntimeError("not tracing")), \
+                self.assertLogs("api.profiling", "ERROR"):
+            response = APIClient().get("/api/dashboard/summary/", HTTP_X_PROFILE="1", **self.bearer(self.user))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+class TransactionSearchTests(APITestCase):
+    def test_ranked_search_with_filters_tracks_writes(self):
+        coffee = self.add_transaction("4.50", "expense", "food", date(2025, 1, 5), description="Coffee at the station")
+        double = self.add_transaction("9.00", "expense", "food", date(2025, 1, 6), description="Coffee beans, coffee filters")
+        self.add_transaction("30.00", "expense", "shopping", date(2025, 2, 1), description="Coffee mug")
+        for day, description in enumerate(["Sandwich", "Bus fare", "Groceries", "Cinema", "Electricity"], start=7):
+            self.add_transaction("12.00", "expense", "food", date(2025, 1, day), description=description)
+        self.add_transaction("4.00", "expense", "food", date(2025, 1, 5), user=CustomUser.objects.create_user(
+            email="other@example.com", name="Other", password="secret-pass-123"
+        ), description="Coffee")
+
+        response = self.client.get("/api/transactions/search/?q=coffee&category=food&end_date=2025-01-31")
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual([row["id"] for row in results], [double.pk, coffee.pk])
+        self.assertGreater(results[0]["rank"], results[1]["rank"])
+
+        # Stemming, and operator characters are treated as plain words
+        self.assertEqual(len(self.client.get('/api/transactions/search/?q="coffees*').data["results"]), 3)
+        self.assertEqual(self.client.get("/api/transactions/search/?q=+").status_code, 400)
+
+        self.client.put(f"/api/transactions/{coffee.pk}/", {
+            "amount": "4.50", "type": "expense", "category": "food", "date": "2025-01-05", "description": "Tea"
+        })
+        self.client.delete(f"/api/transactions/{double.pk}/")
+        self.assertEqual(
+            [row["description"] for row in self.client.get("/api/transactions/search/?q=tea").data["results"]], ["Tea"]
+        )
+        self.assertEqual(
+            [row["description"] for row in self.client.get("/api/transactions/search/?q=coffee").data["results"]],
+            ["Coffee mug"]
+        )
+
+    @skipUnless(connection.vendor == "sqlite", "The FTS5 triggers are SQLite only")
+    def test_triggers_survive_the_migrations(self):
+        # The test database went through every migration and post_migrate
+        self.assertEqual(search.missing_sqlite_triggers(connection), [])
+
+        # What a later table rebuild does, and how post_migrate repairs it
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {search.FTS_TABLE}_ai")
+        self.add_transaction("3.00", "expense", "food", date(2025, 1, 5), description="Croissant")
+        self.assertEqual(self.client.get("/api/transactions/search/?q=croissant").data["results"], [])
+
+        self.assertEqual(search.ensure_sqlite_index(connection), [f"{search.FTS_TABLE}_ai"])
+        self.assertEqual(search.missing_sqlite_triggers(connection), [])
+        self.add_transaction("2.00", "expense", "food", date(2025, 1, 6), description="Croissant again")
+        self.assertEqual(
+            sorted(row["description"] for row in self.client.get("/api/transactions/search/?q=croissant").data["results"]),
+            ["Croissant", "Croissant again"]
+        )
+
+
+class FastReadSerializerTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_transaction("12.5", "expense", "food", date(2025, 1, 10), description="Lunch")
+        self.add_transaction("1000", "income", "salary", date(2025, 1, 1))
+        budgets.recompute(Budget.objects.create(
+            user=self.user, category="food", amount=Decimal("200"), period="monthly",
+            start_date=date(2025, 1, 1), end_date=date(2025, 1, 31)
+        ))
+
+    def test_lists_render_exactly_like_the_model_serializers(self):
+        transactions = Transaction.objects.filter(user=self.user).order_by('-date', '-created_at', '-id')
+        expected = json.loads(JSONRenderer().render(TransactionSerializer(transactions, many=True).data))
+        self.assertEqual(json.loads(self.client.get("/api/transactions/").content)["results"], expected)
+
+        expected = json.loads(JSONRenderer().render(BudgetSerializer(Budget.objects.filter(user=self.user), many=True).data))
+        self.assertEqual(expected[0]["spent"], 12.5)
+        self.assertEqual(json.loads(self.client.get("/api/budgets/").content), expected)
+
+    def test_field_selection(self):
+        response = self.client.get("/api/transactions/?fields=amount,id&ordering=amount&page_size=1")
+        self.assertEqual(response.data["results"], [{"id": Transaction.objects.get(category="food").pk, "amount": "12.50"}])
+        # The cursor still works although its columns weren't selected
+        self.assertEqual(len(self.client.get(response.data["next"]).data["results"]), 1)
+
+        response = self.client.get("/api/budgets/?fields=category,amount")
+        self.assertEqual(response.data, [{"category": "food", "amount": "200.00"}])
+
+        response = self.client.get("/api/transactions/?fields=id,password")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", str(response.data["fields"]))
+
+
+class RendererTests(APITestCase):
+    @skipUnless(settings.HAS_ORJSON, "orjson is not installed")
+    def test_orjson_output_matches_drf(self):
+        data = {
+            "amount": Decimal("12.50"), "total": Decimal("1000"), "small": Decimal("0.01"),
+            "at": dt.datetime(2025, 1, 1, 12, 0, 0, 123456, tzinfo=dt.timezone.utc), "naive": dt.datetime(2025, 1, 1),
+            "on": date(2025, 1, 2), "id": uuid.uuid4(), 3: [1.5, None, True],
+            "text": "caf\u00e9 \u2028\u2029 \x00\x1f\n\t\"\\", "nested": [{"ok": "yes"}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    @skipUnless(settings.HAS_MSGPACK, "msgpack is not installed")
+    def test_msgpack_negotiation_and_parsing(self):
+        import msgpack
+
+        self.add_transaction("12.50", "expense", "food", date(2025, 1, 10))
+        as_json = self.client.get("/api/transactions/").json()
+        response = self.client.get("/api/transactions/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), as_json)
+
+        body = msgpack.packb({"amount": "3.25", "type": "expense", "category": "food", "date": "2025-01-11"})
+        response = self.client.post("/api/transactions/", body, content_type="application/msgpack")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["amount"], "3.25")
+
+        response = self.client.post("/api/transactions/", "{not json", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("JSON parse error", response.data["detail"])
+
+
+class CompressionTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 29):
+            self.add_transaction("12.50", "expense", "food", date(2025, 1, day), description="Groceries and sundries")
+
+    def test_gzip_and_brotli_negotiation(self):
+        plain = self.client.get("/api/transactions/")
+        self.assertNotIn("Content-Encoding", plain)
+
+        response = self.client.get("/api/transactions/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        # A weak ETag still revalidates
+        self.assertEqual(self.client.get(
+            "/api/transactions/", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"]
+        ).status_code, 304)
+
+        if settings.HAS_BROTLI:
+            import brotli
+
+            response = self.client.get("/api/transactions/", HTTP_ACCEPT_ENCODING="gzip;q=0.8, br")
+            self.assertEqual(response["Content-Encoding"], "br")
+            self.assertEqual(brotli.decompress(response.content), plain.content)
+
+        response = self.client.get("/api/transactions/", HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        self.assertNotIn("Content-Encoding", response)
+        # Too small to bother
+        response = self.client.get("/api/transactions/?page_size=1", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_streaming_export_is_compressed_incrementally(self):
+        plain = b"".join(self.client.get("/api/transactions/export/").streaming_content)
+        response = self.client.get("/api/transactions/export/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), plain)
+
+        with self.settings(COMPRESSION_LEVELS={"default": {"br": 4, "gzip": 6}, "transactions-export": {"br": None, "gzip": None}}):
+            response = self.client.get("/api/transactions/export/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_accept_encoding_parsing(self):
+        self.assertEqual(accepted_encodings("gzip;q=0.5, BR, *;q=0"), {"gzip": 0.5, "br": 1.0, "*": 0.0})
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRouterTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_transaction("10.00", "expense", "food", date(2025, 1, 5))
+        cache.clear()  # Drop the pin left by the write above
+        self.router = routers.ReplicaRouter()
+
+    def routed(self, method, url, **data):
+        """Aliases the router picked during the request; 'default' serves them all."""
+        with mock.patch("api.routers.random.choice", side_effect=lambda aliases: "default") as choice:
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(response.status_code, 400)
+        return choice.call_count
+
+    def test_routing_rules(self):
+        request = APIClient().get("/").wsgi_request
+        request.user = self.user
+        self.assertIsNone(self.router.db_for_read(Transaction))
+        token = routers.allow_replica_reads(request)
+        try:
+            self.assertEqual(self.router.db_for_read(Transaction), "replica")
+            self.assertEqual(self.router.db_for_read(Budget), "replica")
+            # Accounts, sessions etc. always read from the primary
+            self.assertIsNone(self.router.db_for_read(CustomUser))
+            self.assertEqual(self.router.db_for_write(Transaction), "default")
+            with self.settings(DATABASE_REPLICAS=[]):
+                self.assertIsNone(self.router.db_for_read(Transaction))
+        finally:
+            routers.end_replica_reads(token)
+        self.assertIsNone(self.router.db_for_read(Transaction))
+        self.assertFalse(self.router.allow_migrate("replica", "api"))
+        self.assertIsNone(self.router.allow_migrate("default", "api"))
+
+    def test_reads_go_to_replica_until_user_writes(self):
+        self.assertGreater(self.routed("get", "/api/transactions/"), 0)
+        self.assertGreater(self.routed("get", "/api/dashboard/summary/"), 0)
+        self.assertGreater(self.routed("get", "/api/budgets/"), 0)
+        # Not a replica view
+        self.assertEqual(self.routed("get", "/api/transactions/export/"), 0)
+
+        self.assertEqual(self.routed("post", "/api/transactions/", amount="5.00", type="expense",
+                                     category="food", date="2025-01-06"), 0)
+        # Read-your-writes: pinned to the primary for REPLICA_PIN_SECONDS
+        self.assertTrue(report_cache.pinned_to_primary(self.user.pk))
+        self.assertEqual(self.routed("get", "/api/dashboard/summary/"), 0)
+        self.assertEqual(self.routed("get", "/api/transactions/"), 0)
+
+        # Other users are unaffected
+        other = CustomUser.objects.create_user(email="other@example.com", name="Other", password="secret-pass-123")
+        self.client.force_authenticate(other)
+        self.assertGreater(self.routed("get", "/api/transactions/"), 0)
+
+        cache.delete(report_cache.pin_key(self.user.pk))
+        self.client.force_authenticate(self.user)
+        self.assertGreater(self.routed("get", "/api/transactions/"), 0)
+
+
+class PartitionTests(APITestCase):
+    def test_command_is_a_no_op_without_partitioning(self):
+        if connection.vendor == "postgresql":
+            self.skipTest("api_transaction is partitioned on Postgres")
+        out = StringIO()
+        call_command("manage_partitions", stdout=out)
+        self.assertIn("not partitioned", out.getvalue())
+        self.assertFalse(partitions.is_partitioned(connection))
+
+    def test_id_lookups_are_narrowed_by_date(self):
+        lunch = self.add_transaction("12.00", "expense", "food", date(2025, 3, 1))
+        taxi = self.add_transaction("30.00", "expense", "transportation", date(2025, 3, 2))
+
+        self.assertEqual(self.client.get(f"/api/transactions/{lunch.pk}/?date=2025-03-01").data["id"], lunch.pk)
+        self.assertEqual(self.client.get(f"/api/transactions/{lunch.pk}/?date=2025-03-02").status_code, 404)
+        self.assertEqual(self.client.get(f"/api/transactions/{lunch.pk}/?date=March").status_code, 400)
+
+        def writes(queries):
+            return [query["sql"] for query in queries if query["sql"].startswith(("UPDATE", "DELETE"))]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(f"/api/transactions/{lunch.pk}/?date=2025-03-01", {
+                "amount": "14.00", "type": "expense", "category": "food", "date": "2025-03-05"
+            }, format="json")
+        self.assertEqual((response.data["amount"], response.data["date"]), ("14.00", "2025-03-05"))
+        lookup = next(query["sql"] for query in queries if query["sql"].startswith("SELECT") and "api_transaction" in query["sql"])
+        self.assertIn('"date" =', lookup)
+        self.assertTrue(all('"date" =' in sql for sql in writes(queries) if "api_transaction" in sql))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/api/transactions/batch/", {"operations": [
+                {"op": "update", "id": lunch.id, "date": "2025-03-05", "data": {"category": "shopping"}},
+                {"op": "delete", "id": taxi.id, "date": "2025-03-02"},
+            ]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all('"date" IN' in sql for sql in writes(queries) if '"api_transaction"' in sql.split(" WHERE")[0]))
+        self.assertEqual(list(Transaction.objects.values_list("category", flat=True)), ["shopping"])
+
+        self.assertEqual(self.client.delete(f"/api/transactions/{lunch.pk}/?date=2025-03-01").status_code, 404)
+        self.assertEqual(self.client.delete(f"/api/transactions/{lunch.pk}/?date=2025-03-05").status_code, 204)
+        self.assertEqual(rollups.reconcile(self.user.id), {})
+
+    @skipUnless(connection.vendor == "postgresql", "Range partitioning is Postgres only")
+    def test_partition_maintenance_and_pruning(self):
+        self.assertTrue(partitions.is_partitioned(connection))
+        this_month = date.today().replace(day=1)
+        names = [name for name, _, _ in partitions.partitions(connection)]
+        self.assertIn(partitions.partition_name(this_month), names)
+
+        # A date with no partition lands in the default one, and moves when
+        # its month gets a partition
+        old = self.add_transaction("7.00", "expense", "food", date(1999, 3, 4))
+        call_command("manage_partitions", "--ahead", "6", stdout=StringIO())
+        self.assertIn(partitions.partition_name(this_month + relativedelta(months=6)),
+                      [name for name, _, _ in partitions.partitions(connection)])
+        partitions.create_partition(connection, date(1999, 3, 1))
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {partitions.partition_name(date(1999, 3, 1))}")
+            self.assertEqual(cursor.fetchone()[0], 1)
+        old.amount = Decimal("8.00")
+        old.save()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"EXPLAIN SELECT sum(amount) FROM {partitions.TABLE} WHERE user_id = %s AND date >= %s AND date < %s",
+                [self.user.pk, this_month, this_month + timedelta(days=20)]
+            )
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        self.assertIn(partitions.partition_name(this_month), plan)
+        self.assertNotIn(partitions.partition_name(date(1999, 3, 1)), plan)
+        self.assertNotIn(partitions.DEFAULT_PARTITION, plan)
+
+        # A partition that still holds rows is never detached
+        with mock.patch("api.partitions.archive.archive"):
+            self.assertEqual(partitions.detach_partitions(connection, date(1999, 4, 1)), [])
+        self.assertTrue(Transaction.objects.filter(pk=old.pk).exists())
+
+        # Detaching archives the month first, so its totals are still counted
+        call_command("manage_partitions", "--detach-before", "1999-04", stdout=StringIO())
+        self.assertFalse(Transaction.objects.filter(pk=old.pk).exists())
+        self.assertNotIn(partitions.partition_name(date(1999, 3, 1)),
+                         [name for name, _, _ in partitions.partitions(connection)])
+        self.assertEqual(TransactionArchive.objects.get(user=self.user, month=date(1999, 3, 1)).count, 1)
+        self.assertEqual(category_totals(self.user, "expense", date(1999, 3, 1), date(1999, 3, 31)),
+                         {"food": Decimal("8.00")})
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        for day in (3, 17, 28):
+            self.add_transaction("12.50", "expense", "food", date(2020, 1, day), description=f"Lunch {day}")
+        self.add_transaction("40.00", "expense", "utilities", date(2020, 1, 20))
+        self.add_transaction("900.00", "income", "salary", date(2020, 1, 31))
+        self.add_transaction("7.25", "expense", "food", date(2020, 2, 14))
+        self.recent = self.add_transaction("5.00", "expense", "food", date.today())
+
+    def export(self):
+        return b"".join(self.client.get("/api/transactions/export/").streaming_content).decode()
+
+    def test_archived_rows_read_through(self):
+        totals = category_totals(self.user, "expense", date(2020, 1, 15), date(2020, 3, 31))
+        exported = self.export()
+        buckets = rollups.stored_buckets(self.user.pk)
+
+        out = StringIO()
+        call_command("archive_transactions", stdout=out)
+        self.assertIn("Archived 6 transaction(s)", out.getvalue())
+        self.assertEqual(list(Transaction.objects.filter(user=self.user)), [self.recent])
+        chunk = TransactionArchive.objects.get(user=self.user, month=date(2020, 1, 1))
+        self.assertEqual(chunk.count, 5)
+        self.assertEqual(chunk.totals["expense"]["food"], ["37.50", 3])
+        self.assertEqual([row["description"] for row in archive.unpack(chunk.payload)][:3], ["Lunch 3", "Lunch 17", ""])
+
+        self.assertEqual(category_totals(self.user, "expense", date(2020, 1, 15), date(2020, 3, 31)), totals)
+        self.assertEqual(self.export(), exported)
+        self.assertEqual(rollups.reconcile(self.user.pk), {})
+        rollups.rebuild(self.user.pk)
+        self.assertEqual(rollups.stored_buckets(self.user.pk), buckets)
+        # Only hot rows are listed
+        self.assertEqual(len(self.client.get("/api/transactions/").data["results"]), 1)
+
+    def test_rows_added_to_an_archived_month_are_merged(self):
+        archive.archive(archive.horizon())
+        self.add_transaction("1.00", "expense", "food", date(2020, 1, 5), description="Late entry")
+        exported = self.export()
+        self.assertIn("Late entry", exported.splitlines()[2])
+
+        self.assertEqual(archive.archive(archive.horizon()), {self.user.pk: 1})
+        self.assertEqual(TransactionArchive.objects.get(user=self.user, month=date(2020, 1, 1)).count, 6)
+        self.assertEqual(self.export(), exported)
+        self.assertEqual(rollups.reconcile(self.user.pk), {})
+
+    def test_moved_rows_are_deleted_within_their_month(self):
+        with CaptureQueriesContext(connection) as queries:
+            archive.archive_month(self.user.pk, date(2020, 1, 1))
+        delete, = [query["sql"] for query in queries.captured_queries if query["sql"].startswith("DELETE")]
+        self.assertIn('"date" >=', delete)
+        self.assertIn('"date" <', delete)
+        self.assertEqual(Transaction.objects.filter(user=self.user, date__lt=date(2020, 2, 1)).count(), 0)
+        self.assertTrue(Transaction.objects.filter(user=self.user, date=date(2020, 2, 14)).exists())
+
+
+class BudgetCounterTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.budget = Budget.objects.create(
+            user=self.user, category="food", amount=Decimal("100.00"),
+            start_date=date(2025, 1, 1), end_date=date(2025, 1, 31)
+        )
+
+    def spent(self):
+        self.budget.refresh_from_db()
+        return self.budget.spent
+
+    def thresholds(self):
+        return sorted(BudgetAlert.objects.filter(budget=self.budget).values_list("threshold", flat=True))
+
+    def test_spent_follows_writes_and_alerts_fire_once(self):
+        response = self.client.post("/api/transactions/", {
+            "amount": "50.00", "type": "expense", "category": "food", "date": "2025-01-10"
+        }, format="json")
+        first = response.data["id"]
+        self.add_transaction("35.00", "expense", "food", date(2025, 1, 31))
+        # Outside the window, another category, income
+        self.add_transaction("500.00", "expense", "food", date(2025, 2, 1))
+        self.add_transaction("500.00", "expense", "shopping", date(2025, 1, 10))
+        self.add_transaction("500.00", "income", "other", date(2025, 1, 10))
+        self.assertEqual(self.spent(), Decimal("85.00"))
+        self.assertEqual(self.thresholds(), [80])
+
+        self.client.put(f"/api/transactions/{first}/", {
+            "amount": "70.00", "type": "expense", "category": "food", "date": "2025-01-10"
+        }, format="json")
+        self.assertEqual(self.spent(), Decimal("105.00"))
+        self.assertEqual(self.thresholds(), [80, 100])
+        alert = BudgetAlert.objects.get(budget=self.budget, threshold=100)
+        self.assertEqual((alert.spent, alert.amount), (Decimal("105.00"), Decimal("100.00")))
+
+        # Moving it out of the window takes it out of spent; dropping back
+        # below a threshold clears it so the next crossing alerts again
+        self.client.put(f"/api/transactions/{first}/", {
+            "amount": "70.00", "type": "expense", "category": "food", "date": "2024-12-31"
+        }, format="json")
+        self.assertEqual(self.spent(), Decimal("35.00"))
+        self.assertEqual(self.thresholds(), [])
+
+        self.add_transaction("65.00", "expense", "food", date(2025, 1, 2))
+        self.assertEqual(self.thresholds(), [80, 100])
+        self.client.delete(f"/api/transactions/{Transaction.objects.get(amount=Decimal('35.00')).pk}/")
+        self.assertEqual(self.spent(), Decimal("65.00"))
+        self.assertEqual(self.thresholds(), [])
+
+    def test_alerts_respect_the_preference(self):
+        self.user.preferences = {"budget_alerts": False}
+        self.user.save()
+        self.add_transaction("120.00", "expense", "food", date(2025, 1, 5))
+        self.assertEqual(self.spent(), Decimal("120.00"))
+        self.assertEqual(self.thresholds(), [])
+
+    def test_saving_a_budget_recounts_spent(self):
+        self.add_transaction("30.00", "expense", "shopping", date(2025, 1, 5))
+        self.add_transaction("40.00", "expense", "shopping", date(2020, 1, 5))
+        archive.archive(date(2021, 1, 1))
+
+        response = self.client.post("/api/budgets/", {
+            "category": "shopping", "amount": "50.00", "period": "annual",
+            "start_date": "2020-01-01", "end_date": "2025-12-31"
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["spent"], Decimal("70.00"))
+        budget_id = response.data["id"]
+        self.assertEqual(sorted(BudgetAlert.objects.filter(budget_id=budget_id).values_list("threshold", flat=True)), [80, 100])
+
+        response = self.client.put(f"/api/budgets/{budget_id}/", {
+            "category": "food", "amount": "50.00", "period": "annual",
+            "start_date": "2020-01-01", "end_date": "2025-12-31"
+        }, format="json")
+        self.assertEqual(response.data["spent"], Decimal("0.00"))
+        self.assertFalse(BudgetAlert.objects.filter(budget_id=budget_id).exists())
+        self.assertEqual(json.loads(self.client.get(f"/api/budgets/{budget_id}/").content)["spent"], 0.0)
+
+    def test_failed_recount_does_not_keep_the_budget(self):
+        with mock.patch("api.views.recompute_spent", side_effect=RuntimeError("recount failed")), \
+                self.assertRaises(RuntimeError):
+            self.client.post("/api/budgets/", {
+                "category": "shopping", "amount": "50.00", "period": "monthly",
+                "start_date": "2025-01-01", "end_date": "2025-01-31"
+            }, format="json")
+        self.assertFalse(Budget.objects.filter(category="shopping").exists())
+
+    def test_alerts_endpoint(self):
+        self.add_transaction("90.00", "expense", "food", date(2025, 1, 5))
+        response = self.client.get("/api/budgets/alerts/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row["budget"], row["category"], row["threshold"]) for row in response.data],
+                         [(self.budget.pk, "food", 80)])
+
+        self.assertEqual(self.client.post("/api/budgets/alerts/", {"ids": [response.data[0]["id"]]}, format="json").data,
+                         {"updated": 1})
+        self.assertEqual(self.client.get("/api/budgets/alerts/?unread=1").data, [])
+        self.assertEqual(self.client.post("/api/budgets/alerts/", {"ids": "all"}, format="json").status_code, 400)
+        for ids in (["x"], [1.5], [None], [True]):
+            self.assertEqual(self.client.post("/api/budgets/alerts/", {"ids": ids}, format="json").status_code, 400)
+
+        other = CustomUser.objects.create_user(email="other@example.com", name="Other", password="secret-pass-123")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get("/api/budgets/alerts/").data, [])
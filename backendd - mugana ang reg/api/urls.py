@@ -1,7 +1,7 @@
 
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
-from .views import TransactionView, BudgetView, ReportsView, RegisterView, LoginView, LogoutView, get_active_accounts, dashboard_summary
+from .views import TransactionView, TransactionExportView, TransactionSearchView, TransactionImportView, TransactionBatchView, BudgetView, BudgetAlertView, ReportsView, RegisterView, LoginView, LogoutView, get_active_accounts, dashboard_summary, JobView, JobDownloadView, report_cache_stats, ProfileView, ProfileDownloadView
 from accounts.views import (
     update_profile, change_password, update_preferences
 )
@@ -10,6 +10,7 @@ from django.conf.urls.static import static
 
 urlpatterns = [
     path('dashboard/summary/', dashboard_summary, name='dashboard-summary'),
+    path('cache/stats/', report_cache_stats, name='report-cache-stats'),
     path("auth/register/", RegisterView.as_view(), name="register"),
     path("auth/login/", LoginView.as_view(), name="login"),
     path("auth/logout/", LogoutView.as_view(), name="logout"),
@@ -22,12 +23,27 @@ urlpatterns = [
 
     # Transactions endpoints
     path("transactions/", TransactionView.as_view(), name="transactions-list"),
+    path("transactions/export/", TransactionExportView.as_view(), name="transactions-export"),
+    path("transactions/search/", TransactionSearchView.as_view(), name="transactions-search"),
+    path("transactions/import/", TransactionImportView.as_view(), name="transactions-import"),
+    path("transactions/batch/", TransactionBatchView.as_view(), name="transactions-batch"),
     path("transactions/<str:transaction_id>/", TransactionView.as_view(), name="transaction-detail"),
     
     # Budget endpoints
     path("budgets/", BudgetView.as_view(), name="budgets-list"),
+    path("budgets/alerts/", BudgetAlertView.as_view(), name="budget-alerts"),
     path("budgets/<str:budget_id>/", BudgetView.as_view(), name="budget-detail"),
     
     # Reports endpoints
     path("reports/<str:report_type>/", ReportsView.as_view(), name="reports"),
+
+    # Background jobs
+    path("jobs/", JobView.as_view(), name="jobs"),
+    path("jobs/<uuid:job_id>/", JobView.as_view(), name="job-detail"),
+    path("jobs/<uuid:job_id>/download/", JobDownloadView.as_view(), name="job-download"),
+
+    # Request profiles (staff)
+    path("profiles/", ProfileView.as_view(), name="profiles"),
+    path("profiles/<uuid:profile_id>/", ProfileView.as_view(), name="profile-detail"),
+    path("profiles/<uuid:profile_id>/download/", ProfileDownloadView.as_view(), name="profile-download"),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,16 +1,33 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import RegisterSerializer, TransactionSerializer, BudgetSerializer
+from .serializers import RegisterSerializer, TransactionSerializer, BudgetSerializer, TransactionFilterSerializer, TransactionReadSerializer, BudgetReadSerializer, BudgetAlertSerializer
 from accounts.serializers import UserSerializer
 from accounts.models import CustomUser
 from django.contrib.auth import authenticate
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth.hashers import check_password
-from .models import Transaction, Budget
+from .models import Transaction, Budget, BudgetAlert
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.db import transaction as db_transaction
+from .ledger import record_changes, snapshot
+from .pagination import TransactionPagination
+from .filters import filter_transactions
+from .exports import LEDGER_COLUMNS, REPORT_COLUMNS, ledger_rows, report_rows, stream_csv
+from .reports import REPORT_FILENAMES, build_report, parse_report_date
+from .imports import import_transactions, parse_csv, parse_ofx
+from .batch import BatchError, run_batch
+from .cache import bump_version_on_commit, cached_for_user, stats as cache_stats
+from .conditional import conditional
+from .budgets import ALERTS_LIMIT, recompute as recompute_spent
+from . import search
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from rest_framework.parsers import MultiPartParser
+import csv
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -90,56 +107,192 @@ def get_active_accounts(request):
 
 
 
+def transaction_lookup(request, transaction_id, queryset=Transaction.objects):
+    """
+    The user's transaction `transaction_id`, narrowed to the optional
+    `?date=YYYY-MM-DD` the client knows it by: with api_transaction
+    partitioned by date, an id alone probes every partition. Raises
+    ValueError if the date is malformed.
+    """
+    transactions = queryset.filter(id=transaction_id, user=request.user)
+    on = parse_report_date(request.query_params.get('date'))
+    return transactions.filter(date=on) if on else transactions
+
+
 class TransactionView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(conditional())
     def get(self, request, transaction_id=None):
         if transaction_id:
-            transaction = get_object_or_404(Transaction, id=transaction_id, user=request.user)
+            try:
+                transaction = get_object_or_404(transaction_lookup(request, transaction_id))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             serializer = TransactionSerializer(transaction)
             return Response(serializer.data)
 
-        transactions = Transaction.objects.filter(user=request.user).order_by('-date', '-created_at')
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        filters = TransactionFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        reader = TransactionReadSerializer.from_request(request)
+        paginator = TransactionPagination()
+        ordering = paginator.orderings[filters.validated_data['ordering']]
+        transactions = filter_transactions(Transaction.objects.filter(user=request.user), **filters.filters())
+        rows = paginator.paginate_queryset(
+            # The keyset columns are fetched even when not selected, for the cursor
+            transactions.values(*reader.columns(*(name.lstrip('-') for name in ordering))),
+            request, view=self, ordering=ordering
+        )
+        return paginator.get_paginated_response(reader.to_representation(rows))
 
     def post(self, request):
         serializer = TransactionSerializer(data=request.data)
         if serializer.is_valid():
-            transaction = serializer.save(user=request.user)
+            with db_transaction.atomic():
+                transaction = serializer.save(user=request.user)
+                record_changes(added=[transaction])
             return Response(TransactionSerializer(transaction).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def put(self, request, transaction_id):
-        transaction = get_object_or_404(Transaction, id=transaction_id, user=request.user)
-        serializer = TransactionSerializer(transaction, data=request.data)
-        if serializer.is_valid():
-            transaction = serializer.save()
-            return Response(TransactionSerializer(transaction).data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        with db_transaction.atomic():
+            try:
+                transaction = get_object_or_404(
+                    transaction_lookup(request, transaction_id, Transaction.objects.select_for_update())
+                )
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            previous = snapshot(transaction)
+            serializer = TransactionSerializer(transaction, data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            # Written by (id, date) rather than save()'s id alone, so only the
+            # row's partition is searched
+            changes = dict(serializer.validated_data, updated_at=timezone.now())
+            Transaction.objects.filter(pk=transaction.pk, date=previous.date).update(**changes)
+            for field, value in changes.items():
+                setattr(transaction, field, value)
+            record_changes(added=[transaction], removed=[previous])
+        return Response(TransactionSerializer(transaction).data)
 
     def delete(self, request, transaction_id):
-        transaction = get_object_or_404(Transaction, id=transaction_id, user=request.user)
-        transaction.delete()
+        with db_transaction.atomic():
+            try:
+                transaction = get_object_or_404(
+                    transaction_lookup(request, transaction_id, Transaction.objects.select_for_update())
+                )
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            Transaction.objects.filter(pk=transaction.pk, date=transaction.date).delete()
+            record_changes(removed=[transaction])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class TransactionExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            start_date = parse_report_date(request.query_params.get('start_date'))
+            end_date = parse_report_date(request.query_params.get('end_date'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        type = request.query_params.get('type')
+        if type and type not in dict(Transaction.TRANSACTION_TYPES):
+            return Response({'error': 'Invalid transaction type'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = ledger_rows(request.user, start_date, end_date, type)
+        return stream_csv([title for title, _ in LEDGER_COLUMNS], rows, 'transactions')
+
+class TransactionSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @method_decorator(conditional())
+    def get(self, request):
+        text = request.query_params.get('q', '')
+        if not search.terms(text):
+            return Response({'error': 'Missing search query'}, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = TransactionFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', search.DEFAULT_LIMIT)), 1), search.MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = search.search(request.user, text, **filters.filters())[:limit]
+        results = []
+        for transaction in matches:
+            data = TransactionSerializer(transaction).data
+            data['rank'] = transaction.rank
+            results.append(data)
+        return Response({'results': results})
+
+class TransactionImportView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format == 'csv':
+            rows = parse_csv(upload)
+        elif file_format in ('ofx', 'qfx'):
+            rows = parse_ofx(
+                upload,
+                expense_category=request.data.get('expense_category', 'other'),
+                income_category=request.data.get('income_category', 'other')
+            )
+        else:
+            return Response({'error': 'Unsupported file format; upload a .csv or .ofx file'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = import_transactions(request.user, rows)
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response({'error': f'Could not read file: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+class TransactionBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            ok, results = run_batch(request.user, request.data.get('operations'))
+        except BatchError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'success': ok, 'results': results},
+            status=status.HTTP_200_OK if ok else status.HTTP_400_BAD_REQUEST
+        )
+
 class BudgetView(APIView):
     permission_classes = [IsAuthenticated]
 
+    # The stamp moves on transaction writes too, which change spent
+    @method_decorator(conditional())
     def get(self, request, budget_id=None):
         if budget_id:
             budget = get_object_or_404(Budget, id=budget_id, user=request.user)
             serializer = BudgetSerializer(budget)
             return Response(serializer.data)
 
+        reader = BudgetReadSerializer.from_request(request)
         budgets = Budget.objects.filter(user=request.user).order_by('-start_date')
-        serializer = BudgetSerializer(budgets, many=True)
-        return Response(serializer.data)
+        return Response(reader.to_representation(budgets.values(*reader.columns())))
 
     def post(self, request):
         serializer = BudgetSerializer(data=request.data)
         if serializer.is_valid():
-            budget = serializer.save(user=request.user)
+            with db_transaction.atomic():
+                budget = serializer.save(user=request.user)
+                recompute_spent(budget)
+            bump_version_on_commit([request.user.pk])
             return Response(BudgetSerializer(budget).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -147,187 +300,172 @@ class BudgetView(APIView):
         budget = get_object_or_404(Budget, id=budget_id, user=request.user)
         serializer = BudgetSerializer(budget, data=request.data)
         if serializer.is_valid():
-            budget = serializer.save()
+            with db_transaction.atomic():
+                budget = serializer.save()
+                recompute_spent(budget)
+            bump_version_on_commit([request.user.pk])
             return Response(BudgetSerializer(budget).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, budget_id):
         budget = get_object_or_404(Budget, id=budget_id, user=request.user)
         budget.delete()
+        bump_version_on_commit([request.user.pk])
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+class BudgetAlertView(APIView):
+    """Threshold crossings recorded at write time (api.budgets); POST marks them read."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        alerts = BudgetAlert.objects.filter(user=request.user).select_related('budget')
+        if request.query_params.get('unread') in ('1', 'true'):
+            alerts = alerts.filter(read_at__isnull=True)
+        return Response(BudgetAlertSerializer(alerts[:ALERTS_LIMIT], many=True).data)
+
+    def post(self, request):
+        alerts = BudgetAlert.objects.filter(user=request.user, read_at__isnull=True)
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(type(id) is int for id in ids):
+                return Response({'error': 'ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+            alerts = alerts.filter(id__in=ids)
+        return Response({'updated': alerts.update(read_at=timezone.now())})
     
-from django.db.models import Sum
-from django.db.models.functions import TruncMonth
-import csv
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from io import BytesIO
 
 class ReportsView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get_spending_report(self, user, start_date=None, end_date=None):
-        transactions = Transaction.objects.filter(
-            user=user,
-            type='expense'
+    def export_csv(self, data, filename, columns):
+        return stream_csv([title for title, _ in columns], report_rows(data, columns), filename)
+
+    def export_pdf(self, request, report_type):
+        """
+        PDFs are too slow to render in the request: queue a report_pdf job
+        and answer 202 with it (200 if an identical one is already queued or
+        done). Poll the job's URL in Location until it has a download_url.
+        """
+        params = {'report_type': report_type}
+        for name in ('start_date', 'end_date'):
+            if request.query_params.get(name):
+                params[name] = request.query_params[name]
+        job, created = enqueue(request.user, 'report_pdf', params)
+        response = Response(
+            JobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
         )
-        if start_date:
-            transactions = transactions.filter(date__gte=start_date)
-        if end_date:
-            transactions = transactions.filter(date__lte=end_date)
-
-        return transactions.values('category').annotate(
-            total=Sum('amount')
-        ).order_by('-total')
-
-    def get_income_report(self, user, start_date=None, end_date=None):
-        transactions = Transaction.objects.filter(
-            user=user,
-            type='income'
-        )
-        if start_date:
-            transactions = transactions.filter(date__gte=start_date)
-        if end_date:
-            transactions = transactions.filter(date__lte=end_date)
-
-        return transactions.values('category').annotate(
-            total=Sum('amount')
-        ).order_by('-total')
-
-    def get_trends(self, user, months=12):
-        return Transaction.objects.filter(
-            user=user
-        ).annotate(
-            month=TruncMonth('date')
-        ).values('month', 'type').annotate(
-            total=Sum('amount')
-        ).order_by('month', 'type')
-
-    def export_csv(self, data, filename):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['Category', 'Amount'])
-        for row in data:
-            writer.writerow([row['category'], 'total'])
-        return response
-
-    def export_pdf(self, data, filename):
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer)
-        y = 800
-        p.drawString(100, y, filename)
-        y -= 20
-        for row in data:
-            p.drawString(100, y, f"{row['category']}: {row['total']}")
-            y -= 15
-        p.showPage()
-        p.save()
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{filename}.pdf"'
+        response['Location'] = request.build_absolute_uri(reverse('job-detail', args=[job.pk]))
+        # The job's status changes without the user's data changing
+        response['Cache-Control'] = 'no-store'
         return response
 
+    @method_decorator(conditional())
     def get(self, request, report_type):
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
+        try:
+            start_date = parse_report_date(request.query_params.get('start_date'))
+            end_date = parse_report_date(request.query_params.get('end_date'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
         export_format = request.query_params.get('export')
 
-        if report_type == 'spending':
-            data = self.get_spending_report(request.user, start_date, end_date)
-            filename = 'spending_report'
-        elif report_type == 'income':
-            data = self.get_income_report(request.user, start_date, end_date)
-            filename = 'income_report'
-        elif report_type == 'trends':
-            data = self.get_trends(request.user)
-            filename = 'trends_report'
-        else:
+        if report_type not in REPORT_FILENAMES:
             return Response({'error': 'Invalid report type'}, status=400)
+        if export_format == 'pdf':
+            return self.export_pdf(request, report_type)
+
+        data = cached_for_user(
+            request.user.pk,
+            f'report:{report_type}',
+            {'start_date': start_date, 'end_date': end_date},
+            lambda: list(build_report(request.user, report_type, start_date, end_date))
+        )
+        filename = REPORT_FILENAMES[report_type]
 
         if export_format == 'csv':
-            return self.export_csv(data, filename)
-        elif export_format == 'pdf':
-            return self.export_pdf(data, filename)
+            return self.export_csv(data, filename, REPORT_COLUMNS[report_type])
 
         return Response(data)
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
-from django.db.models import Sum, Q
-from django.utils import timezone
+from django.http import FileResponse
+from .jobs import enqueue
+from .models import Job
+from .serializers import JobSerializer
+
+class JobView(APIView):
+    """Queue exports and rebuilds for the run_jobs worker and report on their progress."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(Job, id=job_id, user=request.user)
+        return Response(JobSerializer(job, context={'request': request}).data)
+
+    def post(self, request):
+        serializer = JobSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        job, created = enqueue(request.user, serializer.validated_data['kind'], serializer.validated_data['params'])
+        return Response(
+            JobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+        )
+
+class JobDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(Job, id=job_id, user=request.user)
+        if job.status != 'done' or not job.result:
+            return Response({'error': 'Job has no artifact to download', 'status': job.status}, status=status.HTTP_409_CONFLICT)
+        if job.expires_at and job.expires_at < timezone.now():
+            return Response({'error': 'Artifact has expired'}, status=status.HTTP_410_GONE)
+        return FileResponse(job.result.open('rb'), as_attachment=True, filename=job.result.name.rsplit('/', 1)[-1])
+
+from .summary import build_dashboard_summary
+
+def dashboard_payload(user, today):
+    summary = build_dashboard_summary(user, today)
+    return {
+        'totalIncome': summary['total_income'],
+        'totalExpenses': summary['total_expenses'],
+        'balance': summary['balance'],
+        'monthlyChange': summary['monthly_change'],
+        'expensesByCategory': summary['expenses_by_category'],
+        'recentTransactions': TransactionSerializer(summary['recent_transactions'], many=True).data,
+        'spendingOverTime': summary['spending_over_time']
+    }
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(dated=True)
 def dashboard_summary(request):
-    user = request.user
-    today = timezone.now()
-    first_day_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    last_month = first_day_of_month - relativedelta(months=1)
-    
-    # Current month transactions
-    monthly_transactions = Transaction.objects.filter(
-        user=user,
-        date__gte=first_day_of_month,
-        date__lte=today
-    )
-    
-    # Last month transactions for comparison
-    last_month_transactions = Transaction.objects.filter(
-        user=user,
-        date__gte=last_month,
-        date__lt=first_day_of_month
-    )
-    
-    # Calculate current month totals
-    total_income = monthly_transactions.filter(type='income').aggregate(Sum('amount'))['amount__sum'] or 0
-    total_expenses = monthly_transactions.filter(type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-    balance = total_income - total_expenses
-    
-    # Calculate monthly change percentage
-    last_month_total = (
-        last_month_transactions.filter(type='income').aggregate(Sum('amount'))['amount__sum'] or 0
-    ) - (
-        last_month_transactions.filter(type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-    )
-    
-    monthly_change = 0
-    if last_month_total != 0:
-        monthly_change = ((balance - last_month_total) / abs(last_month_total)) * 100
-    
-    # Get expenses by category
-    expenses_by_category = monthly_transactions.filter(
-        type='expense'
-    ).values('category').annotate(
-        amount=Sum('amount')
-    ).order_by('-amount')
-    
-    # Get recent transactions
-    recent_transactions = Transaction.objects.filter(
-        user=user
-    ).order_by('-date', '-created_at')[:5]
-    
-    # Calculate spending over time (last 6 months)
-    spending_over_time = []
-    for i in range(5, -1, -1):
-        month_date = (today - relativedelta(months=i))
-        month_transactions = Transaction.objects.filter(
-            user=user,
-            date__year=month_date.year,
-            date__month=month_date.month
-        )
-        
-        spending_over_time.append({
-            'date': month_date.strftime('%b'),
-            'income': month_transactions.filter(type='income').aggregate(Sum('amount'))['amount__sum'] or 0,
-            'expenses': month_transactions.filter(type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-        })
-    
-    return Response({
-        'totalIncome': total_income,
-        'totalExpenses': total_expenses,
-        'balance': balance,
-        'monthlyChange': 0,  # Calculate this based on previous month if needed
-        'expensesByCategory': expenses_by_category,
-        'recentTransactions': TransactionSerializer(recent_transactions, many=True).data,
-        'spendingOverTime': spending_over_time
-    })
+    today = timezone.localdate()
+    return Response(cached_for_user(
+        request.user.pk, 'dashboard', {'today': today}, lambda: dashboard_payload(request.user, today)
+    ))
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def report_cache_stats(request):
+    return Response(cache_stats())
+
+from .models import RequestProfile
+from .serializers import RequestProfileListSerializer, RequestProfileSerializer
+
+class ProfileView(APIView):
+    """Request profiles captured by ProfilingMiddleware, newest first."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id=None):
+        if profile_id:
+            profile = get_object_or_404(RequestProfile.objects.select_related('user', 'requested_by'), id=profile_id)
+            return Response(RequestProfileSerializer(profile, context={'request': request}).data)
+
+        profiles = RequestProfile.objects.select_related('user', 'requested_by').defer('summary')
+        return Response(RequestProfileListSerializer(profiles, many=True, context={'request': request}).data)
+
+class ProfileDownloadView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id):
+        profile = get_object_or_404(RequestProfile, id=profile_id)
+        return FileResponse(profile.stats.open('rb'), as_attachment=True, filename=f'{profile.pk}.prof')
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,10 +48,24 @@ INSTALLED_APPS = [
     'api',
 ]
 
+# Optional libraries: orjson/msgpack renderers and parsers are used when installed
+HAS_ORJSON = importlib.util.find_spec('orjson') is not None
+HAS_MSGPACK = importlib.util.find_spec('msgpack') is not None
+HAS_BROTLI = importlib.util.find_spec('brotli') is not None  # CompressionMiddleware offers br when installed
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer' if HAS_ORJSON else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (['api.renderers.MessagePackRenderer'] if HAS_MSGPACK else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser' if HAS_ORJSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ] + (['api.renderers.MessagePackParser'] if HAS_MSGPACK else []),
 }
 
 
@@ -59,6 +74,59 @@ from datetime import timedelta
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Caching. Local memory is fine for development; point 'default' at a
+# shared backend (Redis, Memcached, database) in production so every worker
+# sees the same per-user data versions.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+REPORT_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TTL = 60  # Seconds a resolved request.user may be reused
+REPORT_CACHE_TIMEOUT = 60 * 60  # Seconds; entries are also invalidated on every write
+
+BUDGET_ALERT_THRESHOLDS = (80, 100)  # Percent of a budget's amount at which a BudgetAlert is recorded (if the user's budget_alerts preference is on)
+
+# Background jobs (python manage.py run_jobs)
+JOB_ARTIFACT_TTL = timedelta(hours=24)  # How long finished exports stay downloadable
+JOB_STALE_AFTER = timedelta(minutes=30)  # Running jobs older than this are assumed dead and requeued
+JOB_MAX_ATTEMPTS = 3
+JOB_POLL_INTERVAL = 2  # Seconds between queue polls when idle
+
+METRICS_TOKEN = None  # /metrics requires "Authorization: Bearer <token>"; unset, it is only served with DEBUG on
+# Directory shared by every worker (e.g. /run/centsible-metrics, emptied on
+# deploy) where each one writes its metrics for /metrics to sum. Required with
+# more than one worker; None reports only the process answering the scrape.
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 1  # Seconds between a worker's writes to METRICS_DIR
+
+# Response compression (api.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = 1024  # Bytes; smaller bodies aren't worth it
+COMPRESSION_SKIP_TYPES = ('image/', 'video/', 'audio/', 'application/zip', 'application/gzip', 'application/pdf')
+# Per URL name: brotli quality (0-11) and gzip level (1-9); None disables an encoding
+COMPRESSION_LEVELS = {
+    'default': {'br': 4, 'gzip': 6},
+    # Large streamed exports: favour throughput
+    'transactions-export': {'br': 1, 'gzip': 1},
+    'job-download': {'br': 1, 'gzip': 1},
+}
+
+# Avatars (accounts.avatars)
+AVATAR_MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # Bytes
+# None serves files from the worker; 'x-accel-redirect' (nginx) or 'x-sendfile'
+# (Apache/lighttpd) hands them to the front-end server
+AVATAR_SENDFILE = None
+AVATAR_ACCEL_REDIRECT_PREFIX = '/protected-media/avatars/'  # nginx `internal` location aliasing MEDIA_ROOT/avatars/
+
+# Request profiling (X-Profile: 1 from staff, or sampled)
+PROFILING_SAMPLE_RATE = 0.0  # Fraction of requests to PROFILING_SAMPLE_VIEWS profiled for any user
+PROFILING_SAMPLE_VIEWS = ('reports', 'dashboard-summary')
+PROFILING_TRACEMALLOC_FRAMES = 1  # Allocations are summarised per line, so one frame is enough
+PROFILING_KEEP = 100  # Older profiles are deleted
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=7),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
@@ -69,6 +137,8 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -77,7 +147,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    
+    'api.middleware.ReplicaRoutingMiddleware',
+    'api.middleware.ProfilingMiddleware',
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True  # Temporarily allow all origins
@@ -125,6 +196,19 @@ DATABASES = {
     }
 }
 
+# Read replicas: aliases in DATABASES holding streaming copies of 'default',
+# e.g. DATABASES['replica'] = {**DATABASES['default'], 'HOST': 'replica-host',
+# 'TEST': {'MIRROR': 'default'}} and DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+REPLICA_VIEWS = ('reports', 'dashboard-summary', 'transactions-list', 'budgets-list', 'transactions-search')  # URL names whose GETs may read from a replica
+REPLICA_PIN_SECONDS = 10  # After a user's data changes, their reads stay on the primary this long (cover the worst replica lag)
+
+# Monthly api_transaction partitions on Postgres (python manage.py manage_partitions)
+TRANSACTION_PARTITIONS_AHEAD = 3  # Months past the current one to pre-create
+TRANSACTION_PARTITION_RETENTION_MONTHS = None  # Archive and detach partitions older than this many months; None keeps everything
+TRANSACTION_ARCHIVE_AFTER_MONTHS = 24  # Whole months kept in the hot table; python manage.py archive_transactions moves older rows to the archive
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -18,9 +18,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from accounts.avatars import serve as serve_avatar
+from api.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/auth/", include("accounts.urls")),
     path('api/', include('api.urls')),  # <-- This one connects to /api/register/
+    path('metrics', metrics_view, name='metrics'),
+    path(f"{settings.MEDIA_URL.strip('/')}/avatars/<str:name>", serve_avatar, name='avatar'),
 ]